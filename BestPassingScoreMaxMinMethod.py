@@ -3,6 +3,9 @@
 # This method is applied for Curve Fitting Problem
 # That is finding a polynomial curve line
 # which the total distance is minimum
+from collections import Counter
+import heapq
+import numpy as np
 
 
 def max_min_method(student, mean):  # Using the max-min method, brute-force search
@@ -11,25 +14,80 @@ def max_min_method(student, mean):  # Using the max-min method, brute-force sear
     # Calculate the distance between the point X
     # and the student score
     n = len(student)
-    distance_dict = {}
     max_distance_list = []
     # Let x starts with the mean
     x = mean
     # Assume the score is within 0 to 10
     while x > 0:  # Try with number lower than x
-        for i in range(n):
-            distance = abs(student[i] - x)
-            distance_dict[x] = distance  # Store in dicts
-        # Get the maximum distances and numbers
-        max_distance = max(distance_dict.items(), key=lambda x: x[1])
-        max_distance_list.append(list(max_distance))  # Append them to list as a list (2D Array)
-        # Get the element with the maximum distance
+        # The distance of x is the maximum distance over all the students
+        max_distance = max(abs(student[i] - x) for i in range(n))
+        max_distance_list.append([round(x, 2), max_distance])  # Append them to list
         # Subtract the x
         x = x - 0.01
+    # Restore the mean
+    x = mean
+    while x < 10:  # Try with number greater than x
+        max_distance = max(abs(student[i] - x) for i in range(n))
+        max_distance_list.append([round(x, 2), max_distance])
+        # Increase the x
+        x = x + 0.01
     # Finally, return the minimum element and the minimum distance
     return min(max_distance_list, key=lambda x: x[1])
 
 
+# Exact max-min method: the largest distance max(|score - x|) is the
+# distance to the lowest or to the highest score, so the best x is
+# the midpoint of the two, O(n)
+def midpoint_method(student):
+    student = np.asarray(student, dtype=float)
+    low, high = student.min(), student.max()
+    return [float((low + high) / 2), float((high - low) / 2)]
+
+
+# Live leaderboard: scores are inserted and deleted one by one and the
+# passing score follows in O(log n) per change. Two heaps keep the lowest
+# and the highest score, deleted scores are removed lazily from the tops.
+# Live: count of every score on the board, so only those can be removed
+def new_leaderboard(scores=()):
+    scores = list(scores)  # Read more than once
+    board = {'low': list(scores), 'high': [-score for score in scores],
+             'deleted_low': Counter(), 'deleted_high': Counter(), 'live': Counter(scores),
+             'size': len(scores)}
+    heapq.heapify(board['low'])
+    heapq.heapify(board['high'])
+    return board
+
+
+def add_score(board, score):
+    heapq.heappush(board['low'], score)
+    heapq.heappush(board['high'], -score)
+    board['live'][score] += 1
+    board['size'] += 1
+
+
+def remove_score(board, score):
+    if board['live'][score] == 0:
+        raise ValueError(f"Invalid score {score}. It is not on the leaderboard")
+    board['live'][score] -= 1
+    board['deleted_low'][score] += 1
+    board['deleted_high'][-score] += 1
+    board['size'] -= 1
+
+
+def _clean_top(heap, deleted):
+    while heap and deleted[heap[0]] > 0:
+        deleted[heapq.heappop(heap)] -= 1
+
+
+def leaderboard_passing_score(board):
+    if board['size'] == 0:
+        raise ValueError("The leaderboard is empty")
+    _clean_top(board['low'], board['deleted_low'])
+    _clean_top(board['high'], board['deleted_high'])
+    low, high = board['low'][0], -board['high'][0]
+    return [(low + high) / 2, (high - low) / 2]
+
+
 def main():
     # Suppose all the students score below average
     # For example: [2.5, 3.2, 2.8, 4.5, 2.1, 3.0]
@@ -53,6 +111,14 @@ def main():
     for n in range(len(student)):
         if student[n] >= result[0]:
             print(f"Student {n}. Score: {student[n]}")
+    # Exact optimum: the midpoint of the lowest and highest score
+    print("Exact best passing score and distance:", midpoint_method(student))
+    # Live updates: a new student joins and the lowest score is withdrawn
+    board = new_leaderboard(student)
+    add_score(board, 9.5)
+    print("After adding 9.5:", leaderboard_passing_score(board))
+    remove_score(board, min(student))
+    print(f"After removing {min(student)}:", leaderboard_passing_score(board))
 
 
 main()
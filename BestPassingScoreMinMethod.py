@@ -4,6 +4,8 @@
 # We can select the student to pass the subject
 # This is similar to the problem of finding a linear segment
 # which the total distance is minimum
+import numpy as np
+import time
 
 
 def min_method(student, mean):  # Using the min method, brute-force search
@@ -12,26 +14,26 @@ def min_method(student, mean):  # Using the min method, brute-force search
     # Calculate the distance between the point X
     # and the student score
     n = len(student)
-    sum_distance_right = 0
-    sum_distance_left = 0
     left_dict, right_dict = {}, {}
     # Let x starts with the mean
     x = mean
     # Assume the score is within 0 to 10
     while x > 0:  # Try with number lower than x
+        sum_distance_left = 0  # The sum restarts for every x
         for i in range(n):
             distance = abs(student[i] - x)
             sum_distance_left += distance  # Calculate the sum of the distances
-            left_dict[x] = sum_distance_left  # Store in dicts
+        left_dict[round(x, 2)] = sum_distance_left  # Store in dicts
         # Subtract the x
         x = x - 0.01
     # Restore the mean
     x = mean
     while x < 10:  # Try with number greater than x
+        sum_distance_right = 0
         for i in range(n):
             distance = abs(student[i] - x)
             sum_distance_right += distance  # Calculate the sum of the distances
-            right_dict[x] = sum_distance_right  # Store in dicts
+        right_dict[round(x, 2)] = sum_distance_right  # Store in dicts
         # Increase the x
         x = x + 0.01
     # Update two dicts and returns the min element of that list
@@ -40,6 +42,73 @@ def min_method(student, mean):  # Using the min method, brute-force search
     return min(left_dict, key=left_dict.get), min(left_dict.values())
 
 
+# Smallest score v whose weight of scores <= v reaches half of the total
+# (strict: exceeds half). Quickselect on the scores: expected O(n)
+def _weighted_select(scores, weights, half, strict=False):
+    while len(scores) > 32:
+        pivot = np.partition(scores, len(scores) // 2)[len(scores) // 2]
+        below, equal = scores < pivot, scores == pivot
+        w_below = weights[below].sum()
+        w_equal = weights[equal].sum()
+        if w_below > half or (not strict and w_below >= half):
+            scores, weights = scores[below], weights[below]
+        elif w_below + w_equal > half or (not strict and w_below + w_equal >= half):
+            return pivot
+        else:
+            above = scores > pivot
+            half -= w_below + w_equal
+            scores, weights = scores[above], weights[above]
+    order = np.argsort(scores)
+    cumulative = np.cumsum(weights[order])
+    k = np.searchsorted(cumulative, half, side='right' if strict else 'left')
+    return scores[order][min(k, len(scores) - 1)]
+
+
+# Exact min method: the sum of the (weighted) distances |score - x|
+# is minimum at the (weighted) median, found by selection in O(n)
+# Returns the best passing score (the lowest optimum), the minimum distance
+# and the interval of all the optimal passing scores
+def median_method(student, weights=None):
+    student = np.asarray(student, dtype=float)
+    n = len(student)
+    if weights is None:
+        # The optimal interval is between the two middle scores
+        middle = np.partition(student, [(n - 1) // 2, n // 2])
+        lower, upper = middle[(n - 1) // 2], middle[n // 2]
+        distance = np.abs(student - lower).sum()
+    else:
+        weights = np.asarray(weights, dtype=float)
+        half = weights.sum() / 2
+        lower = _weighted_select(student, weights, half)
+        upper = _weighted_select(student, weights, half, strict=True)
+        distance = np.abs(student - lower) @ weights
+    return float(lower), float(distance), (float(lower), float(upper))
+
+
+# The sweep at 10^7 scores would take about 15 minutes, so it is timed on
+# smaller inputs and extrapolated (it is linear in the number of scores)
+def benchmark_median(n=10 ** 7, sweep_sizes=(10 ** 2, 10 ** 3)):
+    rng = np.random.default_rng(42)
+    for size in sweep_sizes:
+        student = np.round(rng.uniform(0, 10, size), 1).tolist()
+        start = time.perf_counter()
+        x, distance = min_method(student, sum(student) / size)
+        sweep_time = time.perf_counter() - start
+        x_exact, exact_distance, interval = median_method(student)
+        print(f"{size} scores: sweep {sweep_time:.3f} s (x = {x}, distance = {distance:.4f}), "
+              f"exact x = {x_exact}, distance = {exact_distance:.4f}")
+    per_score = sweep_time / sweep_sizes[-1]
+    student = rng.uniform(0, 10, n)
+    start = time.perf_counter()
+    x, distance, interval = median_method(student)
+    exact_time = time.perf_counter() - start
+    start = time.perf_counter()
+    median_method(student, rng.integers(1, 5, n))
+    weighted_time = time.perf_counter() - start
+    print(f"{n} scores: exact {exact_time:.3f} s, weighted {weighted_time:.3f} s, "
+          f"sweep (estimated) {per_score * n:.0f} s")
+
+
 def main():
     # Suppose all the students score below average
     # For example: [2.5, 3.2, 2.8, 4.5, 2.1, 3.0]
@@ -63,6 +132,12 @@ def main():
     for n in range(len(student)):
         if student[n] >= result[0]:
             print(f"Student {n}. Score: {student[n]}")
+    # Exact optimum: the median of the scores
+    x, distance, interval = median_method(student)
+    print("Exact best passing score:", x, "minimum distance:", distance)
+    print("All the optimal passing scores:", interval)
+    if input("Run the benchmark with 10^7 scores? (y/n): ") == "y":
+        benchmark_median()
 
 
 main()
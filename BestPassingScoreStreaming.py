@@ -0,0 +1,138 @@
+# This program solves Best Passing Score for huge streams of scores
+# Same problem as the min method: the passing score x minimizing the total
+# distance to all the scores is their median. The scores are never kept:
+# a histogram over the fixed 0 to 10 scale (count and sum of the scores of
+# every bin) is updated chunk by chunk, with bounded memory. Histograms of
+# different shards simply add up, so shards are sketched in parallel.
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import numpy as np
+import os
+import tempfile
+import time
+
+
+def new_sketch(bins=1000, low=0.0, high=10.0):
+    return {'low': low, 'high': high,
+            'counts': np.zeros(bins, dtype=np.int64), 'sums': np.zeros(bins)}
+
+
+def update_sketch(sketch, scores):
+    scores = np.asarray(scores, dtype=float)
+    if np.any((scores < sketch['low']) | (scores > sketch['high'])):
+        raise ValueError("Invalid score. Must be within "
+                         f"{sketch['low']} to {sketch['high']}")
+    bins = len(sketch['counts'])
+    width = (sketch['high'] - sketch['low']) / bins
+    index = np.minimum(((scores - sketch['low']) / width).astype(np.int64), bins - 1)
+    sketch['counts'] += np.bincount(index, minlength=bins)
+    sketch['sums'] += np.bincount(index, weights=scores, minlength=bins)
+    return sketch
+
+
+def merge_sketches(sketches):
+    merged = new_sketch(len(sketches[0]['counts']), sketches[0]['low'], sketches[0]['high'])
+    for sketch in sketches:
+        merged['counts'] += sketch['counts']
+        merged['sums'] += sketch['sums']
+    return merged
+
+
+# The optimum lies in the bin [a, b] where the count passes half the scores
+# The total distance is exact at every bin edge (from the counts and sums),
+# so the best edge is returned with its exact distance, and the convexity
+# of the total distance gives a lower bound for the true minimum in [a, b]
+def sketch_passing_score(sketch):
+    counts, sums = sketch['counts'], sketch['sums']
+    bins = len(counts)
+    edges = np.linspace(sketch['low'], sketch['high'], bins + 1)
+    n, total = counts.sum(), sums.sum()
+    k = int(np.searchsorted(np.cumsum(counts), n / 2))  # The median bin
+    c_below, s_below = counts[:k].sum(), sums[:k].sum()
+    c_in = counts[k]
+    c_above = n - c_below - c_in
+    a, b = edges[k], edges[k + 1]
+    # Sum of |score - x| at the two edges of the median bin
+    distance_a = a * c_below - s_below + (total - s_below) - a * (n - c_below)
+    distance_b = b * (c_below + c_in) - (s_below + sums[k]) \
+        + (total - s_below - sums[k]) - b * c_above
+    # Slopes of the total distance just after a and just before b
+    lower = max(distance_a + min(0, c_below - c_in - c_above) * (b - a),
+                distance_b - max(0, c_below + c_in - c_above) * (b - a))
+    score, distance = (a, distance_a) if distance_a <= distance_b else (b, distance_b)
+    return {'score': float(score), 'distance': float(distance),
+            'score_error': float(b - a),
+            'distance_error': float(max(0.0, distance - max(lower, 0))),
+            'count': int(n)}
+
+
+# Chunks: any iterable of arrays (or lists) of scores
+def stream_passing_score(chunks, bins=1000):
+    sketch = new_sketch(bins)
+    for chunk in chunks:
+        update_sketch(sketch, chunk)
+    return sketch_passing_score(sketch)
+
+
+# A text file with one score per line, read chunk by chunk
+def read_score_chunks(path, chunk_size=1_000_000):
+    with open(path) as file:
+        while True:
+            lines = list(itertools.islice(file, chunk_size))
+            if not lines:
+                return
+            yield np.array(lines, dtype=float)
+
+
+def _sketch_file(path, bins, chunk_size):
+    sketch = new_sketch(bins)
+    for chunk in read_score_chunks(path, chunk_size):
+        update_sketch(sketch, chunk)
+    return sketch
+
+
+# Shards: score files, sketched in worker processes and merged
+def parallel_passing_score(paths, bins=1000, chunk_size=1_000_000, processes=None):
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        sketches = list(pool.map(_sketch_file, paths, [bins] * len(paths),
+                                 [chunk_size] * len(paths)))
+    return sketch_passing_score(merge_sketches(sketches))
+
+
+def generate_scores(n, chunk_size=1_000_000, seed=42):
+    rng = np.random.default_rng(seed)
+    for start in range(0, n, chunk_size):
+        yield np.clip(rng.normal(6.2, 1.8, min(chunk_size, n - start)), 0, 10)
+
+
+def main():
+    print("Streaming Passing Score")
+    # Tens of millions of scores from a generator, never held in memory
+    start = time.perf_counter()
+    result = stream_passing_score(generate_scores(30_000_000))
+    print("{count} scores: passing score = {score:.4f} (+/- {score_error:.4f}), "
+          "distance = {distance:.2f} (+/- {distance_error:.2f})".format(**result),
+          f"{time.perf_counter() - start:.2f} s")
+    # Exact check on a smaller stream
+    scores = np.concatenate(list(generate_scores(1_000_000, seed=7)))
+    result = stream_passing_score(np.array_split(scores, 10))
+    median = np.median(scores)
+    print(f"Estimated {result['score']:.4f} (+/- {result['score_error']:.4f}), "
+          f"exact median {median:.4f}, distance {result['distance']:.2f} "
+          f"vs exact {np.abs(scores - median).sum():.2f}")
+    # Shards of one decimal scores in text files, sketched in parallel
+    with tempfile.TemporaryDirectory() as folder:
+        paths = []
+        for shard, chunk in enumerate(generate_scores(2_000_000, 500_000, seed=3)):
+            paths.append(os.path.join(folder, f"scores_{shard}.txt"))
+            np.savetxt(paths[-1], np.round(chunk, 1), fmt='%.1f')
+        start = time.perf_counter()
+        result = parallel_passing_score(paths)
+        print("{count} scores in {shards} shards: passing score = {score:.4f}, "
+              "distance = {distance:.2f} (+/- {distance_error:.2f})"
+              .format(shards=len(paths), **result),
+              f"{time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
 # Polynomial Curve Fitting Model
 # Use Linear Programming to solve
 # Find the polynomial function of order n equivalent to the set of data
+from concurrent.futures import ProcessPoolExecutor
 from ortools.linear_solver import pywraplp
+from ortools.linear_solver.python import model_builder
 import matplotlib.pyplot as plt
+import multiprocessing
 import numpy as np
+import resource
+import scipy.sparse
+from SharedMemoryPool import shared_data, shared_pool
+import time
 
 
 def solve_curve_fitting(d, degree=1, objective=0):
@@ -23,13 +30,13 @@ def solve_curve_fitting(d, degree=1, objective=0):
     for i in range(n):
         s.Add(u[i] - v[i] == d[i][1] - sum(a[j] * d[i][0] ** j
                                            for j in range(degree + 1)))
-    for i in range(n):
-        s.Add(u[i] <= e)
-        s.Add(v[i] <= e)
     # Objective function (for 2 approaches using absolute value or min-max
     if objective == 0:  # sum fit
         cost = sum(u[i] + v[i] for i in range(n))
-    else:  # max fit
+    else:  # max fit: e is the upper border of u, v
+        for i in range(n):
+            s.Add(u[i] <= e)
+            s.Add(v[i] <= e)
         cost = e
     s.Minimize(cost)
     status = s.Solve()
@@ -38,6 +45,198 @@ def solve_curve_fitting(d, degree=1, objective=0):
     return status, obj_val, sol_val
 
 
+# Vandermonde matrix of the data, built at once with NumPy
+# Scale: use the Chebyshev basis on the data range mapped to [-1, 1],
+# much better conditioned than the powers x^j for large degrees
+def polynomial_basis(x, degree, scale=True):
+    x = np.asarray(x, dtype=float)
+    if scale:
+        domain = (x.min(), x.max())
+        t = (2 * x - domain[0] - domain[1]) / (domain[1] - domain[0])
+        return np.polynomial.chebyshev.chebvander(t, degree), domain
+    return np.vander(x, degree + 1, increasing=True), None
+
+
+# Coefficients of the basis back to a[0] + a[1] * x + ... + a[n] * x^n
+def to_monomial(b, domain):
+    if domain is None:
+        return np.asarray(b).tolist()
+    a = np.polynomial.Chebyshev(b, domain=domain).convert(kind=np.polynomial.Polynomial).coef
+    return np.pad(a, (0, len(b) - len(a))).tolist()
+
+
+# Sum fit as the dual LP: max y * w subject to V^T w = 0, -1 <= w <= 1
+# Only (degree + 1) rows, the coefficients are the duals of these rows
+def _lp_sum_fit(V, y):
+    n, m = V.shape
+    model = model_builder.Model()
+    model.helper.fill_model_from_sparse_data(-np.ones(n), np.ones(n), y, np.zeros(m),
+                                             np.zeros(m), scipy.sparse.csr_matrix(V.T))
+    model.helper.set_maximize(True)
+    solver = model_builder.Solver('glop')
+    status = solver.solve(model)
+    if status != model_builder.SolveStatus.OPTIMAL:
+        return pywraplp.Solver.ABNORMAL, None
+    return pywraplp.Solver.OPTIMAL, np.array(
+        [solver.dual_value(model.linear_constraint_from_index(j)) for j in range(m)])
+
+
+# Max fit by row generation: -e <= y - V b <= e is only needed at the points
+# that define the maximum deviation (degree + 2 of them at the optimum),
+# so rows are added for the most violated points until none is violated
+def _lp_max_fit(V, y, initial=200, batch=100, tol=1e-9):
+    n, m = V.shape
+    s = pywraplp.Solver('Polynomial Curve Fitting',
+                        pywraplp.Solver.GLOP_LINEAR_PROGRAMMING)
+    b = [s.NumVar(-s.infinity(), s.infinity(), 'b[%i]' % j) for j in range(m)]
+    e = s.NumVar(0.0, s.infinity(), 'e')
+    s.Minimize(e)
+    points = np.unique(np.concatenate([np.linspace(0, n - 1, min(n, initial)).astype(int),
+                                       [np.argmin(y), np.argmax(y)]]))
+    status = pywraplp.Solver.NOT_SOLVED
+    while len(points):
+        for i in points.tolist():
+            row = V[i].tolist()
+            upper = s.Constraint(-s.infinity(), y[i])  # y - V b >= -e
+            lower = s.Constraint(y[i], s.infinity())  # y - V b <= e
+            for j in range(m):
+                upper.SetCoefficient(b[j], row[j])
+                lower.SetCoefficient(b[j], row[j])
+            upper.SetCoefficient(e, -1)
+            lower.SetCoefficient(e, 1)
+        status = s.Solve()
+        if status != pywraplp.Solver.OPTIMAL:
+            return status, None
+        sol = np.array([v.solution_value() for v in b])
+        deviation = np.abs(y - V @ sol)
+        violated = np.flatnonzero(deviation > e.solution_value() + tol)
+        if len(violated) > batch:
+            violated = violated[np.argpartition(deviation[violated], -batch)[-batch:]]
+        points = violated
+    return status, sol
+
+
+# Sum fit by iteratively reweighted least squares: the weights 1 / |r_i|
+# turn the weighted squared residuals into the absolute residuals
+def _irls_sum_fit(V, y, max_iterations=100, tol=1e-8, eps=1e-8):
+    b = np.linalg.lstsq(V, y, rcond=None)[0]
+    previous = np.inf
+    for _ in range(max_iterations):
+        r = np.abs(y - V @ b)
+        cost = r.sum()
+        if previous - cost <= tol * max(cost, 1.0):
+            return pywraplp.Solver.OPTIMAL, b
+        previous = cost
+        w = np.sqrt(1 / np.maximum(r, eps))
+        b = np.linalg.lstsq(V * w[:, None], y * w, rcond=None)[0]
+    return pywraplp.Solver.FEASIBLE, b
+
+
+def _fit_basis(V, y, objective, method):
+    if objective == 0:
+        return _irls_sum_fit(V, y) if method == 'irls' else _lp_sum_fit(V, y)
+    return _lp_max_fit(V, y)
+
+
+# Fitting engine for large data: x, y are arrays of the points
+# Objective: 0 sum fit (L1), 1 max fit (L-infinity)
+# Method: 'lp' (exact) or 'irls' (sum fit only, approximate but fast)
+# Returns the same (status, objective value, a[]) as solve_curve_fitting
+def fit_polynomial(x, y, degree=1, objective=0, method='lp', scale=True):
+    y = np.asarray(y, dtype=float)
+    V, domain = polynomial_basis(x, degree, scale)
+    if method == 'irls' and objective != 0:
+        raise ValueError("IRLS only supports the sum fit (objective=0)")
+    status, b = _fit_basis(V, y, objective, method)
+    if b is None:
+        return status, None, None
+    r = np.abs(y - V @ b)
+    obj_val = float(r.sum() if objective == 0 else r.max())
+    return status, obj_val, to_monomial(b, domain)
+
+
+# K-fold cross-validation of one configuration, every fold of the degree
+# slices the same precomputed basis columns. Every configuration is scored
+# with both held-out metrics (NaN for a fold without an optimal fit)
+def _cross_validate(degree, objective, method, folds, seed):
+    start = time.perf_counter()
+    data = shared_data()  # [V | y]
+    V, y = data[:, :degree + 1], data[:, -1]
+    fold = np.random.default_rng(seed).permutation(len(y)) % folds
+    mean_errors, max_errors = [], []
+    for k in range(folds):
+        train = fold != k
+        status, b = _fit_basis(V[train], y[train], objective, method)
+        if b is None:
+            mean_errors.append(np.nan)
+            max_errors.append(np.nan)
+            continue
+        r = np.abs(y[~train] - V[~train] @ b)
+        mean_errors.append(r.mean())
+        max_errors.append(r.max())
+    return (degree, objective, float(np.mean(mean_errors)), float(np.std(mean_errors)),
+            float(np.mean(max_errors)), time.perf_counter() - start)
+
+
+# Model selection: k-fold cross-validation of every (degree, objective)
+# in a process pool. The basis of the highest degree is computed once
+# (Chebyshev columns of lower degrees are its first columns)
+# Errors: held-out mean absolute error (and its std over the folds) and
+# held-out max error, the same for the sum fit and the max fit
+# Method: 'lp' or 'irls' for the sum fit, the max fit always uses the LP
+# Returns one row (degree, objective, mean error, std, max error, time)
+# per configuration
+def select_curve_fitting(x, y, degrees=range(1, 6), objectives=(0, 1), folds=5,
+                         method='lp', seed=42, processes=None):
+    V, domain = polynomial_basis(x, max(degrees), scale=True)
+    configs = [(degree, objective) for degree in degrees for objective in objectives]
+    with shared_pool([V, y], processes=processes) as pool:
+        del V
+        futures = [pool.submit(_cross_validate, degree, objective, method, folds, seed)
+                   for degree, objective in configs]
+        table = [future.result() for future in futures]
+    return table
+
+
+def _benchmark_case(method, n, degree, objective, seed=42):
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(0, 10, n)
+    y = 1 + 2 * x + 1.5 * x ** 2 + rng.standard_normal(n) * 5
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if method == 'current':
+        status, obj_val, sol_val = solve_curve_fitting(np.column_stack([x, y]).tolist(),
+                                                       degree, objective)
+    else:
+        status, obj_val, sol_val = fit_polynomial(x, y, degree, objective, method)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    return elapsed, peak / 1024, obj_val
+
+
+# Fit time and peak memory (each case in a fresh process) for 10^3 to 10^6
+# points; the LP models of the sum fit grow too slow past the limits
+def benchmark_curve_fitting(sizes=(10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6), degree=2,
+                            limits=None):
+    if limits is None:
+        limits = {'current': 10 ** 4, 'lp': 10 ** 4, 'irls': 10 ** 6}
+    cases = [('current', 0), ('lp', 0), ('irls', 0), ('current', 1), ('lp', 1)]
+    print("{:>9}{:>10}{:>10}{:>12}{:>12}{:>16}".format(
+        "Points", "Method", "Fit", "Time (s)", "Peak (MB)", "Objective"))
+    context = multiprocessing.get_context('spawn')
+    for n in sizes:
+        for method, objective in cases:
+            if objective == 0 and n > limits[method]:
+                continue
+            if method == 'current' and n > limits['current']:
+                continue
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                elapsed, peak, obj_val = pool.submit(_benchmark_case, method, n,
+                                                     degree, objective).result()
+            print("{:>9}{:>10}{:>10}{:>12.3f}{:>12.1f}{:>16.4f}".format(
+                n, method, ["sum", "max"][objective], elapsed, peak, obj_val))
+
+
 def main():
     D = [[0.1584, 0.0946],
          [0.8454, 0.2689],
@@ -65,6 +264,22 @@ def main():
     plt.plot(x, y, color='green')
     plt.legend(["Data", "Sum fit"])
     plt.show()
+    # The fitting engine on the same data, then at scale
+    status, obj_val, sol_val = fit_polynomial(np.array(D)[:, 0], np.array(D)[:, 1], degree=2)
+    print("Fitting engine: objective =", obj_val, "a[] =", sol_val)
+    # Cross-validated choice of the degree and the objective
+    rng = np.random.default_rng(42)
+    x = rng.uniform(0, 10, 5000)
+    y = 1 + 2 * x + 1.5 * x ** 2 + rng.standard_normal(len(x)) * 5
+    table = select_curve_fitting(x, y, degrees=range(1, 6), method='irls')
+    print("{:>7}{:>6}{:>12}{:>10}{:>12}{:>10}".format("Degree", "Fit", "CV mean", "Std",
+                                                    "CV max", "Time (s)"))
+    for degree, objective, error, std, max_error, elapsed in table:
+        print("{:>7}{:>6}{:>12.4f}{:>10.4f}{:>12.4f}{:>10.3f}".format(
+            degree, ["sum", "max"][objective], error, std, max_error, elapsed))
+    if input("Run the benchmark? (y/n): ").strip().lower() == "y":
+        benchmark_curve_fitting()
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,11 @@
 # refined finished product.
 # The table consists of Gas, Octane, Min Demand, Max Demand, Price
 from ortools.linear_solver import pywraplp
+from SensitivityAnalysis import sensitivity_report, sweep_objectives
 
 
 # C, D: The table of information about raw and refined products
-def solve_gas(c, d):
+def build_gas_model(c, d):
     s = pywraplp.Solver('Gas Blending Problem',
                         pywraplp.Solver.GLOP_LINEAR_PROGRAMMING)
     nR, nF = len(c), len(d)  # Number of raw and refined products
@@ -28,14 +29,46 @@ def solve_gas(c, d):
     cost = s.Sum(R[i] * c[i][Rcost] for i in range(nR))
     price = s.Sum(F[j] * d[j][Fprice] for j in range(nF))
     s.Maximize(price - cost)
+    return s, G
+
+
+# Sensitivity: also return the reduced costs, shadow prices and ranging
+# of the same solve (see SensitivityAnalysis), variables ordered G, R, F
+def solve_gas(c, d, sensitivity=False):
+    s, G = build_gas_model(c, d)
+    nR, nF = len(c), len(d)
     status = s.Solve()
     # Extracting objective value (profit)
     obj_val = s.Objective().Value()
     # Extracting solution values for G (decision variables)
     sol_val = [[G[i][j].solution_value() for j in range(nF)] for i in range(nR)]
+    if sensitivity:
+        return status, obj_val, sol_val, sensitivity_report(s)
     return status, obj_val, sol_val
 
 
+# The objective coefficients of the model in the order of its variables:
+# G (no cost), then R (minus the crude cost), then F (the product price)
+def gas_objective(crude_costs, product_prices):
+    return ([0.0] * (len(crude_costs) * len(product_prices))
+            + [-cost for cost in crude_costs] + list(product_prices))
+
+
+# Scenarios: list of (crude costs, product prices) to evaluate the plan at
+# Scenarios inside the objective ranges are answered without solving,
+# the others are re-solved with warm starts across worker processes
+# Returns (status, objective value, G, re-solved?) per scenario, with G the
+# blending matrix as in solve_gas
+def solve_gas_scenarios(c, d, scenarios, processes=None):
+    s, G = build_gas_model(c, d)
+    s.Solve()
+    nR, nF = len(c), len(d)
+    objectives = [gas_objective(costs, prices) for costs, prices in scenarios]
+    # The variables are ordered G (row by row), R, F
+    return [(status, obj_val, [sol[i * nF:(i + 1) * nF] for i in range(nR)], resolved)
+            for status, obj_val, sol, resolved in sweep_objectives(s, objectives, processes)]
+
+
 def main():
     # The table of raw gasoline products (C)
     C = [[99, 782, 55.34],
@@ -51,12 +84,31 @@ def main():
          [92, 479, 12596, 61.99],
          [94, 199, 7761, 62.04],
          [90, 479, 12596, 61.99]]
-    status, value, G = solve_gas(C, D)
+    status, value, G, report = solve_gas(C, D, sensitivity=True)
     print("Value of objective function (profit): {:0.2f}".format(value))
     for i in range(len(G)):
         for j in range(len(G[i])):
             print("{0:.1f} \t".format(G[i][j]), end=' ')
         print()
+    # Sensitivity of the crude costs (R) and product prices (F)
+    nR, nF = len(C), len(D)
+    ranges = report['objective_ranges']
+    reduced = report['reduced_costs']
+    print("Crude\tReduced cost\tCost range")
+    for i in range(nR):
+        low, high = ranges[nR * nF + i]
+        print(f"R{i}\t{reduced[nR * nF + i]:.2f}\t\t[{-high:.2f}, {-low:.2f}]")
+    print("Product\tReduced cost\tPrice range")
+    for j in range(nF):
+        low, high = ranges[nR * nF + nR + j]
+        print(f"F{j}\t{reduced[nR * nF + nR + j]:.2f}\t\t[{low:.2f}, {high:.2f}]")
+    # Price scenarios: +/- 1% on every crude cost and product price
+    scenarios = [([C[i][2] * (1 + k / 100) for i in range(nR)],
+                  [D[j][3] * (1 - k / 100) for j in range(nF)]) for k in (-1, 0, 1)]
+    for k, (status, value, sol, resolved) in zip((-1, 0, 1),
+                                                 solve_gas_scenarios(C, D, scenarios)):
+        print(f"Scenario {k:+d}%: profit = {value:.2f}, re-solved = {resolved}")
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -2,93 +2,295 @@
 # Reference to this video to understand K-Mean Clustering
 # https://www.youtube.com/watch?v=GZj6ikx8PAc
 import numpy as np  # For array or matrix calculations
-import matplotlib.pyplot as plt  # For plot
 import cv2  # For image and video procession
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.figure import Figure  # For plot, rendered to files (no window)
 from sklearn.cluster import KMeans  # For KMeans algorithm
 from sklearn.decomposition import PCA  # For 2D plot using PCA
+from sklearn.metrics import silhouette_score  # For the choice of K
+from SharedMemoryPool import shared_data, shared_pool
 
-# Step 1: Get user input for image size and number of clusters
-try:
-    image_height = int(input("Enter image height (e.g., 256): "))
-    image_width = int(input("Enter image width (e.g., 256): "))
-    K = int(input("Enter number of clusters (K) (e.g., 16): "))
-except ValueError:
-    print("Invalid input. Please enter integers only.")
-    exit()
-
-# Step 2: Generate a random image with the given dimensions
-# Each pixel will have 3 color channels (R, G, B) with values from 0 to 255
-np.random.seed(42)  # For reproducibility
-original_image = np.random.randint(0, 256, (image_height, image_width, 3), dtype=np.uint8)
-# Step 3: Reshape image to (num_pixels, 3) - Each row is a pixel with 3 RGB values
-pixels = original_image.reshape((-1, 3))  # Shape: (image_height * image_width, 3)
-# Step 4: Apply K-Means Clustering - Reduce colors from 16.7M to K
-print("Applying K-Means clustering. This may take a moment...")
-kmeans = KMeans(n_clusters=K, random_state=42)
-kmeans.fit(pixels)
-
-# Get the cluster centers (dominant colors) and labels for each pixel
-cluster_centers = np.uint8(kmeans.cluster_centers_)
-labels = kmeans.labels_  # Shape: (image_height * image_width,)
-# Step 5: Recolor the image using the K dominant colors
-compressed_pixels = cluster_centers[labels]  # Replace each pixel with its cluster's color
-compressed_image = compressed_pixels.reshape((image_height, image_width, 3))  # Shape: (image_height, image_width, 3)
-
-# Step 6: Plot the original and compressed images side by side
-fig, axes = plt.subplots(1, 2, figsize=(9, 6))
-axes[0].imshow(cv2.cvtColor(original_image, cv2.COLOR_BGR2RGB))  # Convert BGR to RGB for display
-axes[0].set_title(f'Original Image ({image_height}x{image_width})')
-axes[0].axis('off')
-axes[0].text(0.5, -0.1, f'Pixels: {image_height * image_width}',
-             ha='center', va='top', transform=axes[0].transAxes, fontsize=12)
-
-axes[1].imshow(cv2.cvtColor(compressed_image, cv2.COLOR_BGR2RGB))  # Convert BGR to RGB for display
-axes[1].set_title(f'Compressed Image (K={K} Colors)')
-axes[1].axis('off')
-axes[1].text(0.5, -0.1, f'Pixels: {image_height * image_width}',
-             ha='center', va='top', transform=axes[1].transAxes, fontsize=12)
-
-plt.tight_layout()
-plt.show()
-
-# Step 7: Plot clusters in 3D RGB space to see color grouping
-# Select a random sample of 1000 points for better visualization
-print("Plotting 3D RGB space for color clustering...")
-sampled_pixels = pixels[np.random.choice(pixels.shape[0], min(1000, pixels.shape[0]), replace=False)]
-sampled_labels = kmeans.predict(sampled_pixels)
-
-# Plot the clusters in 3D RGB space
-plot = plt.figure(figsize=(9, 6))
-ax = plot.add_subplot(111, projection='3d')
-
-# Each color in the plot represents a cluster, showing how pixels are grouped
-for i in range(K):
-    cluster_points = sampled_pixels[sampled_labels == i]  # Points in this cluster
-    ax.scatter(cluster_points[:, 0], cluster_points[:, 1], cluster_points[:, 2], s=5)
-
-ax.set_xlabel('Red Channel')
-ax.set_ylabel('Green Channel')
-ax.set_zlabel('Blue Channel')
-ax.set_title('RGB Color Space Clustering (Sampled Pixels)')
-plt.show()
-
-# Step 8: Plot clusters in 2D space using PCA
-print("Reducing 3D RGB space to 2D using PCA...")
-pca = PCA(n_components=2)
-pca_pixels = pca.fit_transform(pixels)  # Shape: (image_height * image_width, 2)
-sampled_pca_pixels = pca_pixels[np.random.choice(pca_pixels.shape[0],
-                                                 min(1000, pca_pixels.shape[0]), replace=False)]
-sampled_pca_labels = kmeans.predict(pixels[np.random.choice(pixels.shape[0],
-                                                            min(1000, pixels.shape[0]), replace=False)])
-
-# Plot the clusters in 2D PCA space
-plt.figure(figsize=(9, 6))
-for i in range(K):
-    cluster_points = sampled_pca_pixels[sampled_pca_labels == i]  # Points in this cluster
-    plt.scatter(cluster_points[:, 0], cluster_points[:, 1], s=8)
-
-plt.xlabel('PCA Component 1')
-plt.ylabel('PCA Component 2')
-plt.title('2D PCA Projection of RGB Clusters')
-plt.legend(loc='upper right', bbox_to_anchor=(1.15, 1))
-plt.show()
+
+# Steps 3 to 5: K-Means Clustering - Reduce colors from 16.7M to K
+# Returns the model, the cluster centers (dominant colors), the label of
+# every pixel and the compressed image
+# Init: initial centers (e.g. the palette found by select_k) or 'k-means++'
+def compress_image(original_image, K, init='k-means++'):
+    # Reshape image to (num_pixels, 3) - Each row is a pixel with 3 RGB values
+    pixels = original_image.reshape((-1, 3))
+    kmeans = KMeans(n_clusters=K, init=init, random_state=42,
+                    n_init='auto' if isinstance(init, str) else 1)
+    kmeans.fit(pixels)
+    cluster_centers = np.uint8(kmeans.cluster_centers_)
+    labels = kmeans.labels_  # Shape: (image_height * image_width,)
+    # Recolor the image using the K dominant colors
+    compressed_image = cluster_centers[labels].reshape(original_image.shape)
+    return kmeans, cluster_centers, labels, compressed_image
+
+
+# One random sample of pixel indices shared by every plot, so the points of
+# the 3D and PCA plots are the same pixels, with the labels already computed
+def sample_pixels(pixels, labels, sample_size=1000, seed=42):
+    rng = np.random.default_rng(seed)
+    index = rng.choice(len(pixels), min(sample_size, len(pixels)), replace=False)
+    return pixels[index], labels[index]
+
+
+# Every plot is saved as a PNG file in output_dir, nothing blocks on a window
+# Images larger than max_side pixels are shown downsampled
+# Image_shape: size of the full image if the images given are downsampled
+def render_plots(original_image, compressed_image, sampled_pixels, sampled_labels, K,
+                 output_dir, max_side=1024, image_shape=None):
+    os.makedirs(output_dir, exist_ok=True)
+    image_height, image_width = (image_shape or original_image.shape)[:2]
+    step = max(1, -(-max(original_image.shape[:2]) // max_side))
+    paths = []
+
+    # Step 6: Plot the original and compressed images side by side
+    fig = Figure(figsize=(9, 6))
+    axes = fig.subplots(1, 2)
+    for ax, image, title in ((axes[0], original_image, f'Original Image ({image_height}x{image_width})'),
+                             (axes[1], compressed_image, f'Compressed Image (K={K} Colors)')):
+        ax.imshow(cv2.cvtColor(np.ascontiguousarray(image[::step, ::step]), cv2.COLOR_BGR2RGB))
+        ax.set_title(title)
+        ax.axis('off')
+        ax.text(0.5, -0.1, f'Pixels: {image_height * image_width}',
+                ha='center', va='top', transform=ax.transAxes, fontsize=12)
+    fig.tight_layout()
+    paths.append(os.path.join(output_dir, "images.png"))
+    fig.savefig(paths[-1])
+
+    # Step 7: Plot clusters in 3D RGB space to see color grouping
+    fig = Figure(figsize=(9, 6))
+    ax = fig.add_subplot(111, projection='3d')
+    # Each color in the plot represents a cluster, showing how pixels are grouped
+    for i in range(K):
+        cluster_points = sampled_pixels[sampled_labels == i]  # Points in this cluster
+        ax.scatter(cluster_points[:, 0], cluster_points[:, 1], cluster_points[:, 2], s=5)
+    ax.set_xlabel('Red Channel')
+    ax.set_ylabel('Green Channel')
+    ax.set_zlabel('Blue Channel')
+    ax.set_title('RGB Color Space Clustering (Sampled Pixels)')
+    paths.append(os.path.join(output_dir, "rgb_clusters.png"))
+    fig.savefig(paths[-1])
+
+    # Step 8: Plot clusters in 2D space using PCA, fitted on the sample only
+    pca_pixels = PCA(n_components=2).fit_transform(sampled_pixels.astype(float))
+    fig = Figure(figsize=(9, 6))
+    ax = fig.add_subplot(111)
+    for i in range(K):
+        cluster_points = pca_pixels[sampled_labels == i]  # Points in this cluster
+        ax.scatter(cluster_points[:, 0], cluster_points[:, 1], s=8, label=f'Cluster {i}')
+    ax.set_xlabel('PCA Component 1')
+    ax.set_ylabel('PCA Component 2')
+    ax.set_title('2D PCA Projection of RGB Clusters')
+    ax.legend(loc='upper right', bbox_to_anchor=(1.15, 1), fontsize='small')
+    paths.append(os.path.join(output_dir, "pca_clusters.png"))
+    fig.savefig(paths[-1])
+    return paths
+
+
+# Visualization stage off the critical path: the plots are rendered in a
+# worker process, from the sample and downsampled images only. Returns a
+# future of the file paths (call .result() before exiting)
+def visualize(original_image, compressed_image, pixels, labels, K, output_dir,
+              executor, sample_size=1000, max_side=1024):
+    sampled_pixels, sampled_labels = sample_pixels(pixels, labels, sample_size)
+    step = max(1, -(-max(original_image.shape[:2]) // max_side))
+    return executor.submit(render_plots, original_image[::step, ::step],
+                           compressed_image[::step, ::step], sampled_pixels,
+                           sampled_labels, K, output_dir, max_side, original_image.shape)
+
+
+# Time of the visualization work of the former script (without the windows):
+# PCA fitted on all the pixels, kmeans.predict on two new samples, rendering
+def _former_visualization(original_image, compressed_image, pixels, kmeans, K, output_dir):
+    sampled_pixels = pixels[np.random.choice(pixels.shape[0], min(1000, pixels.shape[0]),
+                                             replace=False)]
+    sampled_labels = kmeans.predict(sampled_pixels)
+    pca_pixels = PCA(n_components=2).fit_transform(pixels)
+    pca_pixels[np.random.choice(pca_pixels.shape[0], min(1000, pca_pixels.shape[0]),
+                                replace=False)]
+    kmeans.predict(pixels[np.random.choice(pixels.shape[0], min(1000, pixels.shape[0]),
+                                           replace=False)])
+    render_plots(original_image, compressed_image, sampled_pixels, sampled_labels, K,
+                 output_dir, max_side=max(original_image.shape))
+
+
+# Centers for K = len(centers) + count: the count clusters with the largest
+# squared error are split in two along their main axis. A cluster is split
+# once per pass, so when count > len(centers) the pixels are reassigned to
+# the new centers and the largest clusters are split again. This happens in
+# select_k with more than 2 chains: a chain steps from K = 2 to K = 2 + chains
+def split_centers(sample, centers, labels, count):
+    while count > 0:
+        errors = np.bincount(labels, weights=((sample - centers[labels]) ** 2).sum(axis=1),
+                             minlength=len(centers))
+        step = min(count, len(centers))
+        new_centers = [centers.copy()]
+        for cluster in np.argsort(errors)[::-1][:step]:
+            points = sample[labels == cluster]
+            if len(points) < 2:  # Nothing to split: a small shift of the center
+                new_centers.append(centers[cluster:cluster + 1] + 0.5)
+                continue
+            values, vectors = np.linalg.eigh(np.cov(points, rowvar=False))
+            shift = 0.5 * np.sqrt(max(values[-1], 0.0)) * vectors[:, -1]
+            new_centers[0][cluster] = centers[cluster] - shift
+            new_centers.append((centers[cluster] + shift)[None])
+        centers = np.concatenate(new_centers)
+        count -= step
+        if count > 0:
+            distances = (sample ** 2).sum(axis=1)[:, None] - 2 * sample @ centers.T \
+                + (centers ** 2).sum(axis=1)
+            labels = np.argmin(distances, axis=1)
+    return centers
+
+
+# Estimated size of the compressed image in bytes: the labels coded with
+# their entropy (bits per pixel) and the palette
+def compressed_size(labels, K, num_pixels):
+    p = np.bincount(labels, minlength=K) / len(labels)
+    p = p[p > 0]
+    return num_pixels * float(-(p * np.log2(p)).sum()) / 8 + 3 * K
+
+
+# One chain of increasing K on the shared sample: every K starts from the
+# centers of the previous one with the worst clusters split
+def _fit_chain(k_values, num_pixels, silhouette_size, seed):
+    sample = shared_data()
+    rows, centers, labels = [], None, None
+    for k in k_values:
+        start = time.perf_counter()
+        if centers is None or k <= len(centers):
+            kmeans = KMeans(n_clusters=k, n_init=1, random_state=seed)
+        else:
+            kmeans = KMeans(n_clusters=k, n_init=1, random_state=seed,
+                            init=split_centers(sample, centers, labels, k - len(centers)))
+        kmeans.fit(sample)
+        centers, labels = kmeans.cluster_centers_, kmeans.labels_
+        silhouette = silhouette_score(sample, labels, sample_size=silhouette_size,
+                                      random_state=seed)
+        rows.append((k, kmeans.inertia_ / len(sample), float(silhouette),
+                     compressed_size(labels, k, num_pixels), time.perf_counter() - start,
+                     centers.astype(np.float32)))
+    return rows
+
+
+# Elbow of the inertia curve: the K farthest below the line from the first
+# to the last point, both axes scaled to [0, 1]
+def elbow(k_values, inertias):
+    k = (np.asarray(k_values) - k_values[0]) / max(k_values[-1] - k_values[0], 1)
+    y = np.asarray(inertias)
+    y = (y - y.min()) / max(y.max() - y.min(), 1e-12)
+    return int(np.argmax((1 - k) - y))
+
+
+# Auto-K: every K of k_values is fitted on one pixel sample in shared memory,
+# the K are dealt to the worker processes as interleaved chains (a chain
+# steps K by the number of chains, see split_centers)
+# Criterion: 'elbow' (inertia), 'silhouette' (largest), or 'size' (smallest
+# estimated size with a mean squared error at most max_error)
+# Returns the best K, its palette (uint8) and the table
+# (k, inertia, silhouette, size in bytes, seconds) sorted by K
+def select_k(pixels, k_values=range(2, 33), criterion='elbow', max_error=None,
+             sample_size=20_000, silhouette_size=2_000, seed=42, processes=None):
+    if criterion == 'size' and max_error is None:
+        raise ValueError("Invalid max_error. Must be given with the 'size' criterion")
+    k_values = sorted(k_values)
+    rng = np.random.default_rng(seed)
+    index = rng.choice(len(pixels), min(sample_size, len(pixels)), replace=False)
+    chains = processes or os.cpu_count()
+    with shared_pool([pixels[index]], dtype=np.float32, processes=processes) as pool:
+        futures = [pool.submit(_fit_chain, k_values[i::chains], len(pixels),
+                               silhouette_size, seed) for i in range(chains)]
+        rows = sorted(row for future in futures for row in future.result())
+    if criterion == 'elbow':
+        best = elbow([row[0] for row in rows], [row[1] for row in rows])
+    elif criterion == 'silhouette':
+        best = int(np.argmax([row[2] for row in rows]))
+    elif criterion == 'size':
+        valid = [i for i, row in enumerate(rows) if row[1] <= max_error] or [len(rows) - 1]
+        best = min(valid, key=lambda i: rows[i][3])
+    else:
+        raise ValueError(f"Invalid criterion {criterion!r}. Must be 'elbow', "
+                         "'silhouette' or 'size'")
+    palette = np.clip(np.rint(rows[best][5]), 0, 255).astype(np.uint8)
+    return rows[best][0], palette, [row[:5] for row in rows]
+
+
+def print_k_table(table, best_k):
+    print("{:>5}{:>12}{:>12}{:>12}{:>10}".format("K", "Inertia", "Silhouette", "Size (KB)",
+                                                 "Time (s)"))
+    for k, inertia, silhouette, size, seconds in table:
+        print("{:>5}{:>12.1f}{:>12.3f}{:>12.1f}{:>10.3f}{}".format(
+            k, inertia, silhouette, size / 1024, seconds, "  <- best" if k == best_k else ""))
+
+
+def benchmark_visualization(sizes=(256, 1024, 2048), K=16, output_dir="kmeans_plots"):
+    # Critical: time the script waits for the plots, stage: until they are saved
+    print("{:>11}{:>12}{:>14}{:>11}{:>17}{:>15}".format(
+        "Image", "Former (s)", "Critical (s)", "Stage (s)", "Saved (critical)", "Saved (stage)"))
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        executor.submit(int).result()  # Start the worker before timing
+        for size in sizes:
+            original_image = np.random.default_rng(42).integers(0, 256, (size, size, 3),
+                                                                dtype=np.uint8)
+            pixels = original_image.reshape((-1, 3))
+            kmeans = KMeans(n_clusters=K, n_init=1, max_iter=20, random_state=42).fit(pixels)
+            compressed_image = np.uint8(kmeans.cluster_centers_)[kmeans.labels_].reshape(
+                original_image.shape)
+            start = time.perf_counter()
+            _former_visualization(original_image, compressed_image, pixels, kmeans, K,
+                                  output_dir)
+            former_time = time.perf_counter() - start
+            start = time.perf_counter()
+            future = visualize(original_image, compressed_image, pixels, kmeans.labels_, K,
+                               output_dir, executor)
+            critical_time = time.perf_counter() - start
+            future.result()
+            stage_time = time.perf_counter() - start
+            print("{:>11}{:>12.2f}{:>14.3f}{:>11.2f}{:>16.2f}s{:>14.1f}%".format(
+                f"{size}x{size}", former_time, critical_time, stage_time,
+                former_time - critical_time, 100 * (former_time - stage_time) / former_time))
+
+
+def main():
+    # Step 1: Get user input for image size and number of clusters
+    try:
+        image_height = int(input("Enter image height (e.g., 256): "))
+        image_width = int(input("Enter image width (e.g., 256): "))
+        K = int(input("Enter number of clusters (K) (e.g., 16, 0 to choose it): "))
+    except ValueError:
+        print("Invalid input. Please enter integers only.")
+        exit()
+    output_dir = input("Enter output folder for the plots (e.g., kmeans_plots): ") \
+        or "kmeans_plots"
+
+    # Step 2: Generate a random image with the given dimensions
+    # Each pixel will have 3 color channels (R, G, B) with values from 0 to 255
+    np.random.seed(42)  # For reproducibility
+    original_image = np.random.randint(0, 256, (image_height, image_width, 3), dtype=np.uint8)
+    init = 'k-means++'
+    if K == 0:  # Auto-K on a pixel sample, then the full fit from its palette
+        print("Choosing K from 2 to 32...")
+        K, palette, table = select_k(original_image.reshape((-1, 3)))
+        print_k_table(table, K)
+        init = palette.astype(float)
+    print("Applying K-Means clustering. This may take a moment...")
+    kmeans, cluster_centers, labels, compressed_image = compress_image(original_image, K, init)
+
+    # Steps 6 to 8: plots rendered in the background while the script goes on
+    os.makedirs(output_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        future = visualize(original_image, compressed_image, original_image.reshape((-1, 3)),
+                           labels, K, output_dir, executor)
+        cv2.imwrite(os.path.join(output_dir, "compressed.png"), compressed_image)
+        print("Plots saved:", ", ".join(future.result()))
+    if input("Run the visualization benchmark? (y/n): ").strip().lower() == "y":
+        benchmark_visualization(output_dir=output_dir)
+
+
+if __name__ == "__main__":
+    main()
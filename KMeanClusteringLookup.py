@@ -0,0 +1,146 @@
+# K-Mean Clustering for Image Compression: nearest palette color by lookup
+# Assigning a pixel to its cluster (kmeans.predict, cluster_centers[labels])
+# computes its distance to all the K centers. For uint8 RGB pixels the colors
+# are known in advance: the RGB cube is cut into 32^3 cells of 8x8x8 colors
+# and, for every cell, the centers that can be the nearest to some color of
+# the cell are found once. Most cells have a single candidate and the label
+# is a table lookup, the pixels of the other cells are compared with the few
+# candidates of their cell only, so the result is exact. With full=True the
+# cells are refined once for all the 2^24 colors, and the label of a pixel is
+# a single index into this 16 MB table.
+import numpy as np
+import os
+import tempfile
+import time
+from scipy.spatial import cKDTree
+from sklearn.cluster import KMeans
+from KMeanClusteringTiled import assign_labels, make_image_file, stratified_sample
+
+_SHIFT = 3  # 256 / 2^3 = 32 cells per channel
+
+
+# Returns the lookup tables: table[cell] is the label of the cell if it has
+# one candidate, otherwise -1 - row of its candidates in candidates
+# Full: also the label of every color (r, g, b) at colors[r << 16 | g << 8 | b]
+def build_lookup(palette, full=True, chunk=1 << 20):
+    palette = np.asarray(palette, dtype=np.float32)
+    side, size = 256 >> _SHIFT, 1 << _SHIFT
+    low = np.arange(side, dtype=np.float32) * size
+    axes = np.meshgrid(low, low, low, indexing="ij")
+    low = np.stack([axis.ravel() for axis in axes], axis=1)  # (cells, 3)
+    high = low + size - 1
+    # Nearest and farthest points of every cell to every center, per channel
+    near = np.maximum(np.maximum(low[:, None] - palette, palette - high[:, None]), 0)
+    far = np.maximum(np.abs(palette - low[:, None]), np.abs(palette - high[:, None]))
+    min_distance = (near ** 2).sum(axis=2)
+    max_distance = (far ** 2).sum(axis=2)
+    # A center is a candidate if it can beat the best guaranteed distance
+    candidate = min_distance <= max_distance.min(axis=1, keepdims=True) + 1e-3
+    count = candidate.sum(axis=1)
+    table = np.argmax(candidate, axis=1).astype(np.int32)
+    shared = np.flatnonzero(count > 1)
+    table[shared] = -1 - np.arange(len(shared))
+    # Candidates of the shared cells in label order, padded with the first one
+    width = max(count.max(), 1)
+    candidates = np.argsort(~candidate[shared], axis=1, kind="stable")[:, :width]
+    padding = np.arange(width) >= count[shared, None]
+    candidates[padding] = np.broadcast_to(candidates[:, :1], candidates.shape)[padding]
+    lookup = {'table': table, 'candidates': candidates.astype(np.int32), 'palette': palette,
+              'shared_cells': len(shared) / len(table)}
+    if full:
+        colors = np.empty(1 << 24, dtype=np.uint8 if len(palette) <= 256 else np.int32)
+        for start in range(0, 1 << 24, chunk):
+            index = np.arange(start, min(start + chunk, 1 << 24), dtype=np.int32)
+            block = np.stack([index >> 16, (index >> 8) & 255, index & 255], axis=1)
+            colors[start:start + len(index)] = _cell_labels(lookup, block.astype(np.uint8))
+        lookup['colors'] = colors
+    return lookup
+
+
+# Labels of a block of (n, 3) uint8 pixels from the cells of the RGB cube
+def _cell_labels(lookup, block):
+    table, candidates, palette = lookup['table'], lookup['candidates'], lookup['palette']
+    cell = (block[:, 0].astype(np.int32) >> _SHIFT << (16 - 2 * _SHIFT)) \
+        | (block[:, 1].astype(np.int32) >> _SHIFT << (8 - _SHIFT)) \
+        | (block[:, 2].astype(np.int32) >> _SHIFT)
+    labels = table[cell]
+    shared = np.flatnonzero(labels < 0)
+    if len(shared):
+        options = candidates[-1 - labels[shared]]  # (pixels, candidates)
+        diff = block[shared, None, :].astype(np.float32) - palette[options]
+        labels[shared] = np.take_along_axis(
+            options, np.argmin((diff * diff).sum(axis=2), axis=1)[:, None], axis=1)[:, 0]
+    return labels
+
+
+# Pixels: (n, 3) uint8, chunk: pixels at a time (bounded memory)
+def lookup_labels(lookup, pixels, chunk=1 << 20):
+    labels = np.empty(len(pixels), dtype=np.int32)
+    for start in range(0, len(pixels), chunk):
+        block = pixels[start:start + chunk]
+        if 'colors' in lookup:
+            index = block[:, 0].astype(np.int32) << 16
+            index |= block[:, 1].astype(np.int32) << 8
+            index |= block[:, 2]
+            labels[start:start + len(block)] = lookup['colors'][index]
+        else:
+            labels[start:start + len(block)] = _cell_labels(lookup, block)
+    return labels
+
+
+def kdtree_labels(tree, pixels, chunk=1 << 22):
+    return np.concatenate([tree.query(pixels[start:start + chunk])[1]
+                           for start in range(0, len(pixels), chunk)])
+
+
+def _matmul_labels(palette, pixels, chunk=1 << 20):
+    return np.concatenate([assign_labels(pixels[start:start + chunk], palette)
+                           for start in range(0, len(pixels), chunk)])
+
+
+# Full table on the whole image (in memory). The cells alone, the matrix
+# product and the KD-tree on its first slice_megapixels (slower: all are
+# rated in megapixels/second)
+def benchmark_lookup(megapixels=100, ks=(8, 16, 32, 64, 128, 256), slice_megapixels=4):
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "image.npy")
+        side = int(np.sqrt(megapixels * 1e6))
+        make_image_file(path, side, side)
+        sample = stratified_sample(path, 50_000)
+        pixels = np.load(path).reshape(-1, 3)
+    pixels_slice = pixels[:int(slice_megapixels * 1e6)]
+    print(f"{side}x{side} image ({side * side / 1e6:.0f} MP)")
+    print("{:>5}{:>10}{:>9}{:>10}{:>11}{:>12}{:>13}{:>10}{:>8}".format(
+        "K", "Build (s)", "Shared", "LUT MP/s", "Cells MP/s", "Matmul MP/s",
+        "KD-tree MP/s", "Speedup", "Exact"))
+    for k in ks:
+        palette = KMeans(n_clusters=k, n_init=1, random_state=42).fit(
+            sample).cluster_centers_.astype(np.float32)
+        start = time.perf_counter()
+        lookup = build_lookup(palette)
+        build_time = time.perf_counter() - start
+        rates = []
+        for method, data in ((lambda x: lookup_labels(lookup, x), pixels),
+                             (lambda x: _cell_labels(lookup, x), pixels_slice),
+                             (lambda x: _matmul_labels(palette, x), pixels_slice),
+                             (lambda x: kdtree_labels(cKDTree(palette), x), pixels_slice)):
+            start = time.perf_counter()
+            labels = method(data)
+            rates.append(len(data) / 1e6 / (time.perf_counter() - start))
+            if len(rates) == 1:
+                chosen = ((pixels_slice - palette[labels[:len(pixels_slice)]]) ** 2).sum(axis=1)
+            elif len(rates) == 3:
+                best = ((pixels_slice - palette[labels]) ** 2).sum(axis=1)
+        # Same distance as the nearest center (labels may differ on ties)
+        exact = np.mean(chosen <= best + 1e-2)
+        print("{:>5}{:>10.2f}{:>9.1%}{:>10.1f}{:>11.1f}{:>12.1f}{:>13.1f}{:>9.1f}x{:>8.2%}"
+              .format(k, build_time, lookup['shared_cells'], *rates,
+                      rates[0] / rates[2], exact))
+
+
+def main():
+    benchmark_lookup()
+
+
+if __name__ == "__main__":
+    main()
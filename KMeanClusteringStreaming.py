@@ -0,0 +1,132 @@
+# K-Mean Clustering for Image Compression: streams of frames
+# KMeanClustering fits KMeans from scratch for every image. For video frames
+# and image batches the palette of a frame is a good start for the next one:
+# one palette is kept for the whole stream and updated by mini-batch k-means
+# on a sample of each frame, starting from the current centers. The counts of
+# the centers decay from frame to frame (forgetting), so the palette keeps up
+# with colors that change slowly instead of freezing as the counts grow.
+# A drift detector compares the error of the palette on the new frame with
+# its running average: a jump (e.g. a scene cut) triggers a refit.
+import numpy as np
+import time
+from sklearn.cluster import KMeans
+from KMeanClusteringTiled import assign_labels
+
+
+# Drift: refit when the frame error exceeds drift_ratio x the running error
+# Smoothing: weight of the new frame in the running error
+# Forget: share of the center counts kept from one frame to the next
+def new_palette_learner(k=16, sample_size=4096, drift_ratio=1.5, smoothing=0.1,
+                        forget=0.5, seed=42):
+    return {'k': k, 'sample_size': sample_size, 'drift_ratio': drift_ratio,
+            'smoothing': smoothing, 'forget': forget, 'rng': np.random.default_rng(seed),
+            'seed': seed, 'palette': None, 'counts': None, 'error': None,
+            'frames': 0, 'refits': 0}
+
+
+def _refit(learner, sample):
+    kmeans = KMeans(n_clusters=learner['k'], n_init=1, random_state=learner['seed'])
+    kmeans.fit(sample)
+    learner['palette'] = kmeans.cluster_centers_.astype(np.float32)
+    learner['counts'] = np.bincount(kmeans.labels_, minlength=learner['k']).astype(np.float32)
+    learner['refits'] += 1
+
+
+# Mini-batch step: every center moves towards the mean of its sample pixels,
+# with the learning rate (pixels in this batch) / (decayed count + pixels)
+def partial_fit(learner, sample):
+    labels = assign_labels(sample, learner['palette'])
+    counts = np.bincount(labels, minlength=learner['k']).astype(np.float32)
+    sums = np.stack([np.bincount(labels, weights=sample[:, c], minlength=learner['k'])
+                     for c in range(3)], axis=1).astype(np.float32)
+    learner['counts'] = learner['forget'] * learner['counts'] + counts
+    moved = counts > 0
+    rate = counts[moved] / learner['counts'][moved]
+    means = sums[moved] / counts[moved, None]
+    learner['palette'][moved] += rate[:, None] * (means - learner['palette'][moved])
+
+
+# Mean squared distance of the pixels to their nearest palette color
+def palette_error(pixels, palette):
+    labels = assign_labels(pixels, palette)
+    return float(((pixels - palette[labels]) ** 2).sum(axis=1).mean())
+
+
+# Learns from one frame (H, W, 3) and returns the palette and the frame error
+def update_palette(learner, frame):
+    pixels = frame.reshape(-1, 3)
+    index = learner['rng'].integers(0, len(pixels), min(learner['sample_size'], len(pixels)))
+    sample = pixels[index].astype(np.float32)
+    drift = learner['palette'] is None or \
+        palette_error(sample, learner['palette']) > learner['drift_ratio'] * learner['error']
+    if drift:
+        _refit(learner, sample)
+    else:
+        partial_fit(learner, sample)  # Warm start: the current centers
+    palette = learner['palette'].copy()
+    error = palette_error(sample, palette)
+    if drift:  # New scene: the error of the previous one no longer applies
+        learner['error'] = error
+    else:
+        learner['error'] += learner['smoothing'] * (error - learner['error'])
+    learner['frames'] += 1
+    return palette, error
+
+
+# Generator: yields (compressed frame, palette, labels) for every frame
+def compress_stream(frames, k=16, learner=None, **options):
+    if learner is None:
+        learner = new_palette_learner(k, **options)
+    for frame in frames:
+        palette, _ = update_palette(learner, frame)
+        labels = assign_labels(frame.reshape(-1, 3), palette)
+        colors = np.clip(np.rint(palette), 0, 255).astype(np.uint8)
+        yield colors[labels].reshape(frame.shape), colors, labels.reshape(frame.shape[:2])
+
+
+# Synthetic video: a colored pattern slowly moving and changing its colors,
+# with a scene cut (new colors) every cut_every frames
+def generate_frames(count, height=240, width=320, cut_every=50, seed=42):
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    for t in range(count):
+        if t % cut_every == 0:
+            base = rng.uniform(0, 255, (3, 3)).astype(np.float32)
+        phase = 0.05 * t
+        pattern = np.stack([np.sin(x / 40 + phase), np.cos(y / 30 - phase),
+                            np.sin((x + y) / 50 + 2 * phase)], axis=2)
+        frame = 127 + pattern @ (base - 127) / 2
+        frame += 8 * rng.standard_normal(frame.shape, dtype=np.float32)
+        yield np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def benchmark_stream(count=200, k=16, baseline_frames=20):
+    frames = list(generate_frames(count))
+    learner = new_palette_learner(k)
+    errors = []
+    start = time.perf_counter()
+    for frame, (compressed, _, _) in zip(frames, compress_stream(frames, learner=learner)):
+        errors.append(((frame.astype(np.float32) - compressed) ** 2).sum(axis=2).mean())
+    stream_time = time.perf_counter() - start
+    print(f"Streaming: {count / stream_time:.1f} frames/s, mean squared error "
+          f"{np.mean(errors):.2f} ({np.mean(errors[:baseline_frames]):.2f} on the first "
+          f"{baseline_frames} frames), {learner['refits']} refits")
+    # Per-frame full KMeans on every pixel, as in KMeanClustering
+    errors = []
+    start = time.perf_counter()
+    for frame in frames[:baseline_frames]:
+        pixels = frame.reshape(-1, 3).astype(np.float32)
+        kmeans = KMeans(n_clusters=k, n_init=1, random_state=42).fit(pixels)
+        compressed = np.clip(np.rint(kmeans.cluster_centers_), 0, 255)[kmeans.labels_]
+        errors.append(((pixels - compressed) ** 2).sum(axis=1).mean())
+    full_time = time.perf_counter() - start
+    print(f"Full KMeans per frame: {baseline_frames / full_time:.1f} frames/s, "
+          f"mean squared error {np.mean(errors):.2f} (first {baseline_frames} frames)")
+
+
+def main():
+    benchmark_stream()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# K-Mean Clustering for Image Compression: tiled pipeline for large images
+# KMeanClustering fits KMeans on every pixel and builds a full compressed copy,
+# which does not fit in memory for 20k x 20k images. Here the image is a .npy
+# file (H, W, 3) of uint8 read through memory maps: the palette is fitted on
+# a stratified sample of pixels, then the labels are assigned one band of rows
+# at a time in float32 and written to the output files as they are computed.
+# Every band is mapped and unmapped on its own, so the resident memory stays
+# bounded by the band size whatever the image size.
+import numpy as np
+import os
+import resource
+import tempfile
+import time
+from sklearn.cluster import KMeans
+
+
+# Shape, dtype and data offset of a .npy file
+def npy_layout(path):
+    with open(path, "rb") as file:
+        version = np.lib.format.read_magic(file)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+        if fortran_order:
+            raise ValueError(f"{path} is in Fortran order. Must be C order")
+        return shape, dtype, file.tell()
+
+
+# An empty .npy file of the given shape, filled later band by band
+def create_npy(path, shape, dtype=np.uint8):
+    dtype = np.dtype(dtype)
+    header = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False,
+              'shape': tuple(shape)}
+    with open(path, "wb") as file:
+        np.lib.format.write_array_header_1_0(file, header)
+        file.truncate(file.tell() + int(np.prod(shape)) * dtype.itemsize)
+
+
+# Rows [first, first + rows) of the image as a memory map
+def read_band(path, layout, first, rows, mode="r"):
+    shape, dtype, offset = layout
+    row_bytes = int(np.prod(shape[1:])) * dtype.itemsize
+    return np.memmap(path, dtype=dtype, mode=mode, offset=offset + first * row_bytes,
+                     shape=(rows,) + tuple(shape[1:]))
+
+
+# The image is cut into a grid x grid blocks and the same number of pixels
+# is drawn at random in every block, so small regions still get colors
+# Only one row of blocks is mapped at a time
+def stratified_sample(path, sample_size=200_000, grid=16, seed=42):
+    layout = npy_layout(path)
+    height, width = layout[0][:2]
+    rng = np.random.default_rng(seed)
+    row_edges = np.linspace(0, height, min(grid, height) + 1).astype(int)
+    col_edges = np.linspace(0, width, min(grid, width) + 1).astype(int)
+    per_block = -(-sample_size // ((len(row_edges) - 1) * (len(col_edges) - 1)))
+    sample = []
+    for top, bottom in zip(row_edges[:-1], row_edges[1:]):
+        rows = rng.integers(0, bottom - top, (len(col_edges) - 1, per_block))
+        cols = rng.integers(col_edges[:-1, None], col_edges[1:, None],
+                            (len(col_edges) - 1, per_block))
+        band = read_band(path, layout, top, bottom - top)
+        sample.append(np.asarray(band[rows.ravel(), cols.ravel()], dtype=np.float32))
+        del band
+    return np.concatenate(sample)
+
+
+def fit_palette(sample, k, seed=42):
+    kmeans = KMeans(n_clusters=k, n_init=1, random_state=seed)
+    kmeans.fit(sample)
+    return kmeans.cluster_centers_.astype(np.float32)
+
+
+# Nearest center of every pixel: argmin of |c|^2 - 2 x.c (|x|^2 is the same
+# for all the centers), one float32 matrix product per band
+def assign_labels(pixels, palette):
+    distances = pixels.astype(np.float32) @ (-2 * palette.T)
+    distances += (palette * palette).sum(axis=1)
+    return np.argmin(distances, axis=1)
+
+
+# Input_path: (H, W, 3) uint8 .npy file, output_path: the quantized image
+# Labels_path: optional (H, W) uint8 labels (K <= 256), the compressed form
+# Band_pixels: pixels processed (and resident) at a time
+def quantize_image_file(input_path, output_path, k=16, labels_path=None,
+                        sample_size=200_000, band_pixels=1 << 20, seed=42):
+    if labels_path is not None and k > 256:
+        raise ValueError("Invalid K for uint8 labels. Must be at most 256")
+    start = time.perf_counter()
+    layout = npy_layout(input_path)
+    height, width = layout[0][:2]
+    palette = fit_palette(stratified_sample(input_path, sample_size, seed=seed), k, seed)
+    fit_time = time.perf_counter() - start
+    colors = np.clip(np.rint(palette), 0, 255).astype(np.uint8)
+    create_npy(output_path, layout[0])
+    if labels_path is not None:
+        create_npy(labels_path, (height, width))
+    output_layout = npy_layout(output_path)
+    labels_layout = None if labels_path is None else npy_layout(labels_path)
+    rows = max(1, band_pixels // width)
+    inertia = 0.0
+    for first in range(0, height, rows):
+        count = min(rows, height - first)
+        band = read_band(input_path, layout, first, count)
+        pixels = np.asarray(band, dtype=np.float32).reshape(-1, 3)
+        del band
+        labels = assign_labels(pixels, palette)
+        inertia += float(((pixels - palette[labels]) ** 2).sum())
+        output = read_band(output_path, output_layout, first, count, "r+")
+        output[:] = colors[labels].reshape(count, width, 3)
+        output.flush()
+        del output
+        if labels_path is not None:
+            output = read_band(labels_path, labels_layout, first, count, "r+")
+            output[:] = labels.reshape(count, width)
+            output.flush()
+            del output
+    seconds = time.perf_counter() - start
+    return {'palette': colors, 'inertia': inertia, 'fit_seconds': fit_time,
+            'seconds': seconds, 'megapixels_per_second': height * width / 1e6 / seconds,
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+
+# A synthetic (height, width, 3) image written band by band: color gradients,
+# stripes and noise
+def make_image_file(path, height, width, band_rows=128, seed=42):
+    rng = np.random.default_rng(seed)
+    create_npy(path, (height, width, 3))
+    layout = npy_layout(path)
+    x = np.linspace(0, 1, width, dtype=np.float32)
+    for first in range(0, height, band_rows):
+        y = np.linspace(first, min(first + band_rows, height) - 1,
+                        min(band_rows, height - first), dtype=np.float32)[:, None] / height
+        band = np.stack([255 * x + 0 * y, 255 * y + 0 * x,
+                         127 + 120 * np.sin(12 * np.pi * (x + y))], axis=2)
+        band += 12 * rng.standard_normal(band.shape, dtype=np.float32)
+        image = read_band(path, layout, first, len(y), "r+")
+        image[:] = np.clip(band, 0, 255).astype(np.uint8)
+        image.flush()
+        del image
+
+
+def main():
+    k = 16
+    with tempfile.TemporaryDirectory() as folder:
+        # Palette from the sample against KMeans on every pixel (small image)
+        input_path = os.path.join(folder, "small.npy")
+        make_image_file(input_path, 512, 512)
+        result = quantize_image_file(input_path, os.path.join(folder, "small_out.npy"), k,
+                                     sample_size=20_000)
+        pixels = np.load(input_path).reshape(-1, 3).astype(np.float32)
+        full = KMeans(n_clusters=k, n_init=1, random_state=42).fit(pixels)
+        print(f"512x512: mean squared error {result['inertia'] / len(pixels):.2f} "
+              f"(sample) vs {full.inertia_ / len(pixels):.2f} (all pixels)")
+        # Large image, never fully in memory
+        height = width = 8192
+        input_path = os.path.join(folder, "large.npy")
+        make_image_file(input_path, height, width)
+        result = quantize_image_file(input_path, os.path.join(folder, "large_out.npy"), k,
+                                     labels_path=os.path.join(folder, "large_labels.npy"))
+        print(f"{height}x{width} ({height * width * 3 / 2 ** 20:.0f} MB): "
+              f"fit {result['fit_seconds']:.2f} s, total {result['seconds']:.2f} s, "
+              f"{result['megapixels_per_second']:.1f} MP/s, "
+              f"peak RSS {result['peak_rss_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
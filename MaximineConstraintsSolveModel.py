@@ -4,9 +4,11 @@
 from ortools.linear_solver import pywraplp
 import numpy as np
 import matplotlib.pyplot as plt
+import time
 
 
-def solve_model(obj_func):
+# The model is built once: solver, variables and constraints
+def build_model():
     # Create linear solver with Google Linear Optimization
     # solver = pywraplp.Solver.CreateSolver('GLOP')
     solver = pywraplp.Solver("Simple Linear Programming Example",
@@ -18,19 +20,69 @@ def solve_model(obj_func):
     solver.Add(x + 2 * y <= 14)  # x + 2y ≤ 14
     solver.Add(3 * x - y >= 0)  # 3x - y ≥ 0
     solver.Add(x - y <= 2)  # x - y ≤ 2
-    # Create the objective function: f(x, y) = obj_func(x, y)
     objective = solver.Objective()
+    objective.SetMaximization()  # Maximize the objective
+    return {'solver': solver, 'x': x, 'y': y, 'objective': objective}
+
+
+def solve_model(obj_func):
+    model = build_model()
+    solver, x, y, objective = model['solver'], model['x'], model['y'], model['objective']
+    # Create the objective function: f(x, y) = obj_func(x, y)
     # Assuming obj_func is a lambda function like: lambda x, y: 3*x + 4*y
     # We'll extract the coefficients for x and y
     objective.SetCoefficient(x, obj_func[0])  # Coefficient for x
     objective.SetCoefficient(y, obj_func[1])  # Coefficient for y
-    objective.SetMaximization()  # Maximize the objective
     # Solve the problem
     status = solver.Solve()
     return (status, solver.Objective().Value(),
             x.solution_value(), y.solution_value())
 
 
+# Objectives: (k, 2) coefficients of x and y, solved one after the other on
+# the same model. Only the objective coefficients change, so GLOP starts
+# each solve from the optimal basis of the previous one
+# Returns the statuses, objective values, optimal vertices (k, 2) and the
+# latency of every solve (s)
+def solve_many(model, objectives):
+    solver, x, y, objective = model['solver'], model['x'], model['y'], model['objective']
+    objectives = np.asarray(objectives, dtype=float).reshape(-1, 2)
+    statuses = np.empty(len(objectives), dtype=int)
+    values = np.full(len(objectives), np.nan)
+    vertices = np.full((len(objectives), 2), np.nan)
+    latencies = np.empty(len(objectives))
+    for k, (cx, cy) in enumerate(objectives.tolist()):
+        start = time.perf_counter()
+        objective.SetCoefficient(x, cx)
+        objective.SetCoefficient(y, cy)
+        statuses[k] = solver.Solve()
+        if statuses[k] == pywraplp.Solver.OPTIMAL:
+            values[k] = objective.Value()
+            vertices[k] = x.solution_value(), y.solution_value()
+        latencies[k] = time.perf_counter() - start
+    return statuses, values, vertices, latencies
+
+
+# Directions around the circle trace the vertices of the feasible polygon
+def benchmark_solve_many(count=10000):
+    angles = np.linspace(0, 2 * np.pi, count, endpoint=False)
+    objectives = np.column_stack([np.cos(angles), np.sin(angles)])
+    start = time.perf_counter()
+    statuses, values, vertices, latencies = solve_many(build_model(), objectives)
+    total = time.perf_counter() - start
+    polygon = np.unique(np.round(vertices, 9), axis=0)
+    print(f"solve_many: {count} objectives in {total:.3f} s, latency "
+          f"p50 = {np.median(latencies) * 1e6:.1f} us, "
+          f"p99 = {np.percentile(latencies, 99) * 1e6:.1f} us")
+    print(f"Vertices of the feasible polygon: {polygon.tolist()}")
+    start = time.perf_counter()
+    for cx, cy in objectives[:1000].tolist():
+        solve_model([cx, cy])
+    rebuild = (time.perf_counter() - start) / 1000
+    print(f"Model rebuilt for every objective: {rebuild * 1e6:.1f} us per solve "
+          f"({rebuild * len(latencies) / latencies.sum():.1f}x slower)")
+
+
 def draw_plot(fxy):
     x_vals = np.linspace(0, 6, 500)
     y1 = (14 - x_vals) / 2  # x + 2y = 14
@@ -73,6 +125,9 @@ def main():
         print(x_val)
         print(y_val)
         draw_plot(fxy)
+    if input("Trace the feasible polygon with many objectives? (y/n): ").strip().lower() == "y":
+        benchmark_solve_many()
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -31,4 +31,5 @@ def main():
         print("y =", y_val)
 
 
-main()
+if __name__ == "__main__":
+    main()
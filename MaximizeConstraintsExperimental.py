@@ -1,29 +1,238 @@
 # Maximize a function subject to the following constraints
 # 0 ≤ x ≤ 1; 0 ≤ y ≤ 2; x + y ≤ 2
 # Using experimental methods
+# The constraints are A [x, y] <= b (or A [x, y, z] <= b in 3-D). A linear
+# function reaches its maximum at a vertex of the feasible polytope, so the
+# vertices are enumerated once (every choice of 2 or 3 constraints taken as
+# equalities, kept if the point is feasible) and any number of linear
+# objectives are evaluated on all of them with one matrix product. Other
+# functions are evaluated on a dense grid of feasible points.
+from MaximizeConstraints import solve_model as solve_maximize_constraints
+from MaximineConstraintsSolveModel import build_model, solve_many
+from ortools.linear_solver import pywraplp
+import ast
+import itertools
+import numpy as np
+import time
+
+# 0 ≤ x ≤ 1; 0 ≤ y ≤ 2; x + y ≤ 2
+A = np.array([[-1, 0], [1, 0], [0, -1], [0, 1], [1, 1]], dtype=float)
+b = np.array([0, 1, 0, 2, 2], dtype=float)
+
+_FUNCTIONS = {'sin': np.sin, 'cos': np.cos, 'tan': np.tan, 'exp': np.exp, 'log': np.log,
+              'sqrt': np.sqrt, 'abs': np.abs}
+_OPERATORS = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply,
+              ast.Div: np.divide, ast.Pow: np.power}
+
+
+# Direction d != 0 with a d <= 0 (the polytope is unbounded along it), or
+# None. If a has full rank, such a cone has an extreme ray, where d - 1
+# independent rows are 0: the normal of one row (2-D) or of two (3-D)
+def _recession_direction(a, tol=1e-9):
+    d = a.shape[1]
+    if np.linalg.matrix_rank(a) < d:
+        return np.linalg.svd(a)[2][-1]
+    if d == 2:
+        rays = a @ np.array([[0, 1], [-1, 0]], dtype=float)
+    else:
+        pairs = np.array(list(itertools.combinations(range(len(a)), 2)))
+        rays = np.cross(a[pairs[:, 0]], a[pairs[:, 1]])
+    rays = rays[np.linalg.norm(rays, axis=1) > tol]
+    rays = np.concatenate([rays, -rays])
+    rays /= np.linalg.norm(rays, axis=1, keepdims=True)
+    inside = np.all(rays @ a.T <= tol, axis=1)
+    return rays[np.argmax(inside)] if inside.any() else None
+
+
+# Vertices of {p : a p <= b} in 2-D or 3-D, as a (k, d) array
+# Raises ValueError if the polytope is empty or unbounded
+def polytope_vertices(a, b, tol=1e-9):
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    d = a.shape[1]
+    rows = np.array(list(itertools.combinations(range(len(a)), d))).reshape(-1, d)
+    systems = a[rows]  # (combinations, d, d)
+    regular = np.abs(np.linalg.det(systems)) > tol
+    points = np.linalg.solve(systems[regular], b[rows[regular]][:, :, None])[:, :, 0]
+    feasible = np.all(points @ a.T <= b + tol * (1 + np.abs(b)), axis=1)
+    vertices = np.unique(np.round(points[feasible], 9), axis=0) + 0.0
+    direction = _recession_direction(a, tol)
+    # Without a vertex, only a feasible set containing a line is not empty
+    if len(vertices) == 0 and (direction is None
+                               or _lp_status(a, b) == pywraplp.Solver.INFEASIBLE):
+        raise ValueError("Invalid constraints. The feasible set is empty")
+    if direction is not None:
+        raise ValueError("Invalid constraints. The feasible set is unbounded along "
+                         f"{direction.round(6).tolist()}")
+    return vertices
+
+
+# Status of the feasibility LP of {p : a p <= b}
+def _lp_status(a, b):
+    solver = pywraplp.Solver.CreateSolver('GLOP')
+    p = [solver.NumVar(-solver.infinity(), solver.infinity(), f"p{i}")
+         for i in range(a.shape[1])]
+    for row, bound in zip(a.tolist(), b.tolist()):
+        solver.Add(solver.Sum([c * var for c, var in zip(row, p)]) <= bound)
+    return solver.Solve()
+
+
+# Linear objectives: (d,) or (k, d) coefficients, all evaluated at once
+# Returns the maximum values and the vertices where they are reached
+def maximize_linear(vertices, objectives):
+    objectives = np.atleast_2d(np.asarray(objectives, dtype=float))
+    values = vertices @ objectives.T  # (vertices, objectives)
+    best = np.argmax(values, axis=0)
+    return values[best, np.arange(len(objectives))], vertices[best]
+
+
+# f: function of arrays (x, y) or (x, y, z), evaluated on the vertices and on
+# a grid of resolution points per axis over the bounding box of the polytope
+# (only the feasible grid points are kept). Infinite and NaN values are
+# skipped. Returns the maximum and its point
+def experimental_methods(f, a=A, b=b, resolution=501, vertices=None):
+    if vertices is None:
+        vertices = polytope_vertices(a, b)
+    axes = [np.linspace(low, high, resolution)
+            for low, high in zip(vertices.min(axis=0), vertices.max(axis=0))]
+    grid = np.stack([axis.ravel() for axis in np.meshgrid(*axes, indexing="ij")], axis=1)
+    grid = grid[np.all(grid @ np.asarray(a).T <= np.asarray(b) + 1e-9, axis=1)]
+    points = np.concatenate([vertices, grid])
+    with np.errstate(all="ignore"):
+        values = np.broadcast_to(np.asarray(f(*points.T), dtype=float), len(points))
+    values = np.where(np.isfinite(values), values, -np.inf)  # e.g. x / y at y = 0
+    if not np.isfinite(values).any():
+        raise ValueError("Invalid function. It has no finite value on the polytope")
+    best = int(np.argmax(values))
+    return float(values[best]), points[best]
+
+
+# Reads a function such as "3*x + y" or "x*sin(y)" without eval: only
+# numbers, the variables, + - * / ** and the functions of _FUNCTIONS
+# Returns the vectorized function and its coefficients if it is linear
+def parse_function(text, variables=('x', 'y')):
+    tree = ast.parse(text.replace('^', '**'), mode='eval').body
+
+    def build(node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return lambda env: node.value
+        if isinstance(node, ast.Name) and node.id in variables:
+            return lambda env: env[node.id]
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            operand = build(node.operand)
+            sign = -1 if isinstance(node.op, ast.USub) else 1
+            return lambda env: sign * operand(env)
+        if isinstance(node, ast.BinOp) and type(node.op) in _OPERATORS:
+            left, right, op = build(node.left), build(node.right), _OPERATORS[type(node.op)]
+            return lambda env: op(left(env), right(env))
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) \
+                and node.func.id in _FUNCTIONS and len(node.args) == 1:
+            func, arg = _FUNCTIONS[node.func.id], build(node.args[0])
+            return lambda env: func(arg(env))
+        raise ValueError(f"Invalid expression {ast.unparse(node)!r}. Use numbers, "
+                         f"{', '.join(variables)}, + - * / ** and {', '.join(_FUNCTIONS)}")
+
+    # Linear part: (coefficients, constant), or None if not linear
+    def linear(node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return np.zeros(len(variables)), float(node.value)
+        if isinstance(node, ast.Name) and node.id in variables:
+            return np.eye(len(variables))[variables.index(node.id)], 0.0
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            part = linear(node.operand)
+            sign = -1 if isinstance(node.op, ast.USub) else 1
+            return None if part is None else (sign * part[0], sign * part[1])
+        if isinstance(node, ast.BinOp):
+            left, right = linear(node.left), linear(node.right)
+            if left is None or right is None:
+                return None
+            if isinstance(node.op, (ast.Add, ast.Sub)):
+                sign = 1 if isinstance(node.op, ast.Add) else -1
+                return left[0] + sign * right[0], left[1] + sign * right[1]
+            if isinstance(node.op, ast.Mult) and not right[0].any():
+                return left[0] * right[1], left[1] * right[1]
+            if isinstance(node.op, ast.Mult) and not left[0].any():
+                return right[0] * left[1], right[1] * left[1]
+            if isinstance(node.op, ast.Div) and not right[0].any() and right[1] != 0:
+                return left[0] / right[1], left[1] / right[1]
+        return None
+
+    evaluate = build(tree)
+    part = linear(tree)
+    return (lambda *values: evaluate(dict(zip(variables, values)))), \
+        (None if part is None else part[0])
 
 
-def experimental_methods(f):  # f: objective function
-    # x in [0, 1]; y in [0, 2]; x + y <= 2: Decision variables
-    # With constraints x + y ≤ 2, what is max(f(x,y))
-    # Try (x = 0, y = 0); (x = 0, y = 1); (x = 0, y = 2);
-    # (x = 1, y = 0); (x = 1, y = 1); (x = 1, y = 2)
-    max_value = float('inf')
-    res = 0
-    xy = [[0, 0], [0, 1], [0, 2], [1, 0], [1, 1]]
-    for i in range(len(xy)):
-        res = f(xy[i][0], xy[i][1])
-        if res < max_value:
-            max_value = res
-    print(res)
+def benchmark_vertices(count=100_000):
+    rng = np.random.default_rng(42)
+    angles = rng.uniform(0, 2 * np.pi, count)
+    objectives = np.column_stack([np.cos(angles), np.sin(angles)])
+    print("{:<44}{:>16}".format("Method", "Objectives/s"))
+    # Polygon of MaximineConstraintsSolveModel
+    a = np.array([[1, 2], [-3, 1], [1, -1], [-1, 0], [1, 0], [0, -1], [0, 1]], dtype=float)
+    start = time.perf_counter()
+    vertices = polytope_vertices(a, [14, 0, 2, 0, 4, 0, 6])
+    values, _ = maximize_linear(vertices, objectives)
+    rate = count / (time.perf_counter() - start)
+    print("{:<44}{:>16.0f}".format("Vertices (enumeration included)", rate))
+    start = time.perf_counter()
+    _, lp_values, _, _ = solve_many(build_model(), objectives[:10000])
+    print("{:<44}{:>16.0f}".format("solve_many (MaximineConstraintsSolveModel)",
+                                   10000 / (time.perf_counter() - start)))
+    print(f"Largest difference with the LP: {np.abs(values[:10000] - lp_values).max():.2e}")
+    # MaximizeConstraints solves 3x + y, the model is built for every solve
+    start = time.perf_counter()
+    for _ in range(1000):
+        status, obj_val, x_val, y_val = solve_maximize_constraints()
+    print("{:<44}{:>16.0f}".format("solve_model (MaximizeConstraints)",
+                                   1000 / (time.perf_counter() - start)))
+    values, _ = maximize_linear(polytope_vertices(A, b), [3, 1])
+    print(f"3x + y: LP {obj_val}, vertices {values[0]}")
+    # 3-D: a random polytope inside a box, against GLOP
+    a3 = np.concatenate([rng.normal(0, 1, (20, 3)), np.eye(3), -np.eye(3)])
+    b3 = np.concatenate([rng.uniform(1, 2, 20), np.full(6, 5)])
+    vertices = polytope_vertices(a3, b3)
+    objectives = rng.normal(0, 1, (100, 3))
+    values, _ = maximize_linear(vertices, objectives)
+    solver = pywraplp.Solver.CreateSolver('GLOP')
+    v = [solver.NumVar(-solver.infinity(), solver.infinity(), f"v{i}") for i in range(3)]
+    for row, bound in zip(a3.tolist(), b3.tolist()):
+        solver.Add(solver.Sum([c * var for c, var in zip(row, v)]) <= bound)
+    objective = solver.Objective()
+    objective.SetMaximization()
+    errors = []
+    for value, c in zip(values, objectives.tolist()):
+        for var, coefficient in zip(v, c):
+            objective.SetCoefficient(var, coefficient)
+        solver.Solve()
+        errors.append(abs(value - objective.Value()))
+    print(f"3-D polytope: {len(vertices)} vertices, largest difference with GLOP "
+          f"{max(errors):.2e}")
+    # Nonlinear function on a grid
+    f, _ = parse_function("x * sin(3 * y) + y ** 2 / 4")
+    start = time.perf_counter()
+    best, point = experimental_methods(f, resolution=1001)
+    print(f"Grid (1001 x 1001): {1001 ** 2 / (time.perf_counter() - start):.0f} "
+          f"points/s, maximum {best:.4f} at {point.round(4).tolist()}")
 
 
 def main():
     print("Find maximize in equation (Constraints)")
     fxy = input("Enter exact equation f(x): ")
-    fxy_lambda = eval(f"lambda x, y: {fxy}")
-    print("The maximum of this function is", end=" ")
-    experimental_methods(fxy_lambda)
+    try:
+        f, coefficients = parse_function(fxy)
+    except (SyntaxError, ValueError) as error:
+        print(error)
+        return
+    vertices = polytope_vertices(A, b)
+    if coefficients is not None:  # Linear: the best vertex is the maximum
+        values, points = maximize_linear(vertices, coefficients)
+        best, point = float(f(*points[0])), points[0]
+    else:
+        best, point = experimental_methods(f, vertices=vertices)
+    print("The maximum of this function is", best, "at (x, y) =", tuple(point.tolist()))
+    if input("Run the benchmark? (y/n): ").strip().lower() == "y":
+        benchmark_vertices()
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
 # This program finds the maximum integer
 # Using optimization
 from ortools.linear_solver import pywraplp
+import heapq
 import numpy as np
+import time
 # Idea: For a min encountered, set its index as 1, the others are 0
 
 
-def solve_model(x, k):
+# Constraints: optional side constraints on y, as a list of
+# (coefficients, lower, upper): lower <= sum(coefficients[i] * y[i]) <= upper
+def solve_model(x, k, largest=False, constraints=()):
     # Create linear solver with Solving Constraint Integer Program
     solver = pywraplp.Solver.CreateSolver("SCIP")
     n = len(x)
@@ -17,14 +21,107 @@ def solve_model(x, k):
     # e.g. If we want to find 2 minimum values (k = 2)
     # then their marked index sum is 1.0 + 1.0 = 2.0, equal to k
     solver.Add(solver.Sum(y) == k)
+    for coefficients, lower, upper in constraints:
+        row = solver.Constraint(lower, upper)
+        for i in range(n):
+            row.SetCoefficient(y[i], float(coefficients[i]))
     # Objective function
-    solver.Minimize(solver.Sum(x[i] * y[i] for i in range(n)))
+    if largest:
+        solver.Maximize(solver.Sum(x[i] * y[i] for i in range(n)))
+    else:
+        solver.Minimize(solver.Sum(x[i] * y[i] for i in range(n)))
     # Solve the problem
     status = solver.Solve()
     return (status, solver.Objective().Value(),
             [y[i].solution_value() for i in range(n)])
 
 
+# Top-k selection without the integer program: np.argpartition puts the
+# k smallest (or largest) values first in O(n). The MIP is only needed
+# when there are side constraints on y
+# Returns the same status, objective value and indicator vector y
+# (y is an int8 array, so that 10^8 elements stay small)
+def top_k(x, k, largest=False, constraints=()):
+    if constraints:
+        return solve_model(x, k, largest, constraints)
+    x = np.asarray(x)
+    if k <= 0 or k > len(x):
+        return pywraplp.Solver.INFEASIBLE, None, None
+    if largest:
+        index = np.argpartition(x, len(x) - k)[len(x) - k:]
+    else:
+        index = np.argpartition(x, k - 1)[:k]
+    y = np.zeros(len(x), dtype=np.int8)
+    y[index] = 1
+    return pywraplp.Solver.OPTIMAL, x[index].sum().item(), y
+
+
+# Top-k of a stream that does not fit in memory, with a bounded heap of k
+# (value, index) pairs. Items: numbers, or NumPy chunks of numbers
+# The chunks are selected on their own dtype and the values negated as
+# Python numbers, so unsigned and minimum integers do not overflow
+# Returns the status, the objective value and the selected indices
+def top_k_stream(items, k, largest=False):
+    if k <= 0:
+        return pywraplp.Solver.INFEASIBLE, None, None
+    sign = 1 if largest else -1  # The heap keeps the k best: its top is the worst
+    heap, n = [], 0
+    for item in items:
+        if np.ndim(item) == 0:
+            entry = (sign * (item.item() if isinstance(item, np.generic) else item), n)
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+            n += 1
+            continue
+        chunk = np.asarray(item)
+        # Only the k best of a chunk can enter the heap
+        if len(chunk) <= k:
+            best = np.arange(len(chunk))
+        elif largest:
+            best = np.argpartition(chunk, len(chunk) - k)[len(chunk) - k:]
+        else:
+            best = np.argpartition(chunk, k - 1)[:k]
+        for value, i in zip(chunk[best].tolist(), (best + n).tolist()):
+            if len(heap) < k:
+                heapq.heappush(heap, (sign * value, i))
+            elif (sign * value, i) > heap[0]:
+                heapq.heapreplace(heap, (sign * value, i))
+        n += len(chunk)
+    if len(heap) < k:
+        return pywraplp.Solver.INFEASIBLE, None, None
+    return (pywraplp.Solver.OPTIMAL, sign * sum(value for value, _ in heap),
+            sorted(i for _, i in heap))
+
+
+def benchmark_top_k(sizes=(10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7, 10 ** 8), k=10,
+                    mip_limit=10 ** 4, chunk_size=10 ** 6):
+    rng = np.random.default_rng(42)
+    print("{:>11}{:>12}{:>12}{:>12}{:>16}".format(
+        "Elements", "MIP (s)", "Top-k (s)", "Stream (s)", "Objective"))
+    for n in sizes:
+        x = rng.integers(1, 10 ** 6, size=n, dtype=np.int32)
+        mip_time = "-"
+        if n <= mip_limit:
+            start = time.perf_counter()
+            status, mip_obj, y = solve_model(x.tolist(), k)
+            mip_time = f"{time.perf_counter() - start:.3f}"
+        start = time.perf_counter()
+        status, obj_val, y = top_k(x, k)
+        top_time = time.perf_counter() - start
+        start = time.perf_counter()
+        status, stream_obj, index = top_k_stream(
+            (x[i:i + chunk_size] for i in range(0, n, chunk_size)), k)
+        stream_time = time.perf_counter() - start
+        assert stream_obj == obj_val
+        if n <= mip_limit:
+            assert abs(mip_obj - obj_val) < 1e-6
+        print("{:>11}{:>12}{:>12.4f}{:>12.4f}{:>16}".format(
+            n, mip_time, top_time, stream_time, obj_val))
+        del x, y
+
+
 def main():
     n = int(input("Enter size of the array: "))
     X = np.random.randint(1, 20, size=n)
@@ -35,6 +132,14 @@ def main():
         print("Solution:")
         print("Objective value =", obj_val)
         print("y =", y)
+    # Same result without the integer program
+    status, obj_val, y = top_k(X, k)
+    print("Top-k: objective value =", obj_val)
+    print("y =", y.tolist())
+    status, obj_val, index = top_k_stream(iter(X.tolist()), k, largest=True)
+    print("Largest", k, "(stream): objective value =", obj_val, "at", index)
+    if input("Run the benchmark? (y/n): ").strip().lower() == "y":
+        benchmark_top_k()
 
 
 main()
@@ -5,53 +5,106 @@
 # Select the set of foods that will satisfy
 # a set of daily nutritional requirement at minimum cost.
 from ortools.linear_solver import pywraplp
+from ortools.linear_solver import linear_solver_pb2
 import numpy as np
+import os
+import tempfile
+import time
 
 
-# N 2-dimensional matrix (table) contains the food and its nutrition
-def solve_diet(n):
+# Split the table N (list, array or memory-mapped array) into its parts
+# Arrays are sliced, not copied, so a memory-mapped table stays on disk
+def split_diet_table(n):
+    n_foods = len(n) - 2  # Exclude the last two rows
+    foods = np.asarray(n[:n_foods])
+    n_nutrients = foods.shape[1] - 3  # Exclude the last three cols
+    nutrient_min = np.asarray(n[n_foods], dtype=float)[:n_nutrients]
+    nutrient_max = np.asarray(n[n_foods + 1], dtype=float)[:n_nutrients]
+    return (foods[:, :n_nutrients], foods[:, n_nutrients], foods[:, n_nutrients + 1],
+            foods[:, n_nutrients + 2], nutrient_min, nutrient_max)
+
+
+# A table saved with np.save, opened without reading it into memory
+def load_diet_table(path):
+    return np.load(path, mmap_mode='r')
+
+
+# Nutrients: (foods x nutrients) matrix, the other arguments are vectors
+# The model is written straight into a model proto, one ranged row per
+# nutrient (Min <= sum(fi * Ni) <= Max), filled chunk by chunk of foods
+def solve_diet_matrix(nutrients, serving_min, serving_max, cost,
+                      nutrient_min, nutrient_max, chunk_size=4096):
+    timings = {}
+    start = time.perf_counter()
+    n_foods, n_nutrients = nutrients.shape
+    model = linear_solver_pb2.MPModelProto(name='Diet Problem')
+    for lb, ub, c in zip(np.asarray(serving_min, dtype=float).tolist(),
+                         np.asarray(serving_max, dtype=float).tolist(),
+                         np.asarray(cost, dtype=float).tolist()):
+        model.variable.add(lower_bound=lb, upper_bound=ub, objective_coefficient=c)
+    rows = [model.constraint.add(lower_bound=nutrient_min[j], upper_bound=nutrient_max[j])
+            for j in range(n_nutrients)]
+    for first in range(0, n_foods, chunk_size):
+        # Each chunk is read once, and only the non-zero contents are stored
+        block = np.asarray(nutrients[first:first + chunk_size], dtype=float).T
+        for j, row in enumerate(rows):
+            index = np.flatnonzero(block[j])
+            row.var_index.extend((index + first).tolist())
+            row.coefficient.extend(block[j, index].tolist())
     solver = pywraplp.Solver("Diet Problem",
                              pywraplp.Solver.GLOP_LINEAR_PROGRAMMING)
-    # Decision variables
-    # fi: number of servings of each food
-    n_foods = len(n) - 2  # Exclude the last two rows
-    # ni: nutritional content of each food
-    n_nutrients = len(n[0]) - 3  # Exclude the last three cols
-    # The position of MinServing (l), MaxServing (u), Cost for one portion
-    f_min, f_max, f_cost = n_nutrients, n_nutrients + 1, n_nutrients + 2
-    # The position of MinNutrient (a), MaxNutrient (b) for one portion
-    n_min, n_max = n_foods, n_foods + 1
-    # f is an array with the decision variable in range [l, u]
-    f = [solver.NumVar(n[i][f_min], n[i][f_max], 'f[%i]' % i)
-         for i in range(n_foods)]
-    print("Number of variables =", solver.NumVariables())
-    # Constraints
-    # The number of servings selected (called fi) must not exceed
-    # the min and max servings for each food
-    # Thus,the sum of the product of fi and the nutritional content
-    # of each food must not exceed the nutritional content capacity
-    for j in range(n_nutrients):
-        solver.Add(solver.Sum([f[i] * n[i][j]
-                               for i in range(n_foods)]) >= n[n_min][j])
-        solver.Add(solver.Sum([f[i] * n[i][j]
-                               for i in range(n_foods)]) <= n[n_max][j])
-    print("Number of constraints =", solver.NumConstraints())
-    # Objective: Minimum cost sigma(fi * ci)
-    solver.Minimize(solver.Sum(f[i] * n[i][f_cost]
-                               for i in range(n_foods)))
+    solver.LoadModelFromProto(model)
+    timings['build'] = time.perf_counter() - start
+    start = time.perf_counter()
     status = solver.Solve()
+    timings['solve'] = time.perf_counter() - start
+    if status != solver.OPTIMAL:
+        return status, None, None, timings
+    # Achieved nutrients: a single matrix-vector product
+    start = time.perf_counter()
+    servings = np.array([v.solution_value() for v in solver.variables()])
+    achieved = servings @ nutrients
+    timings['post'] = time.perf_counter() - start
+    return status, servings, achieved, timings
+
+
+# N 2-dimensional matrix (table) contains the food and its nutrition
+def solve_diet(n):
+    table = split_diet_table(n)
+    status, servings, achieved, timings = solve_diet_matrix(*table)
+    print("Number of variables =", len(table[0]))
+    print("Number of constraints =", table[0].shape[1])
     # Return an array with optimal value of decision variables f[i]
-    if status == solver.OPTIMAL:
-        return [f[i].solution_value() for i in range(n_foods)]
-    elif status != solver.OPTIMAL:
+    if status == pywraplp.Solver.OPTIMAL:
+        return servings.tolist()
+    elif status != pywraplp.Solver.OPTIMAL:
         print("This problem does not have an optimal solution!")
-        if status == solver.FEASIBLE:
+        if status == pywraplp.Solver.FEASIBLE:
             print("A potentially suboptimal solution was found.")
         else:
             print("The solver could not solve the problem.")
         return None
 
 
+# A random food database, written to a memory-mapped .npy file
+# Every food has 10% non-zero nutrients, bounds come from a feasible menu
+def make_diet_table(path, n_foods, n_nutrients, seed=42):
+    rng = np.random.default_rng(seed)
+    table = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64,
+                                      shape=(n_foods + 2, n_nutrients + 3))
+    contents = rng.uniform(1, 100, (n_foods, n_nutrients))
+    contents[rng.random((n_foods, n_nutrients)) > 0.1] = 0
+    table[:n_foods, :n_nutrients] = contents
+    table[:n_foods, n_nutrients] = 0  # Min serving
+    table[:n_foods, n_nutrients + 1] = 10  # Max serving
+    table[:n_foods, n_nutrients + 2] = rng.uniform(1, 10, n_foods)  # Cost
+    reference = contents.sum(axis=0) / n_foods * 50
+    table[n_foods, :n_nutrients] = 0.5 * reference
+    table[n_foods + 1, :n_nutrients] = 1.5 * reference
+    table.flush()
+    return table
+
+
 def main():
     # The matrix contains the N0, N1, N2, N3, Min, Max, Cost for each food (Fi)
     # The last two rows contain Min/Max of nutrients
@@ -64,18 +117,22 @@ def main():
          [15446, 76946, 82057, 6280, ]]
     fi = solve_diet(N)
     print("Serving of each food:\n", fi)
-    # Calculate the nutritional content
-    x = len(N) - 2
-    solution_list = []
-    array = np.array(N[0:x])  # Create an array (exclude the last 2rows and the last 3 cols)
-    for i in range(len(array) - 1):
-        for j in range(len(array[:, i])):
-            res = fi[j] * array[:, i][j]  # fi * Ni
-            solution_list.append(res)  # Append to list
-    # Convert to array, reshape to 5x5 matrix
-    solution = np.array(solution_list).reshape(4, 5)
-    for k in range(len(solution)):  # Calculate the sum
-        print(f"Solution N{k}: {np.sum(solution[k])}")
+    # Calculate the nutritional content: sum(fi * Ni) for every nutrient
+    nutrients = split_diet_table(N)[0]
+    solution = np.asarray(fi) @ nutrients
+    for k in range(len(solution)):
+        print(f"Solution N{k}: {solution[k]}")
+    # A large food database: 8,000 foods, 150 nutrients, memory-mapped
+    print("Large food database (8000 foods, 150 nutrients)")
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'foods.npy')
+        make_diet_table(path, 8000, 150)
+        table = load_diet_table(path)
+        status, servings, achieved, timings = solve_diet_matrix(*split_diet_table(table))
+        print(f"Cost = {servings @ table[:-2, -1]:.2f}")
+        print("Build: {build:.3f} s, Solve: {solve:.3f} s, Post-processing: {post:.4f} s"
+              .format(**timings))
+        del table
 
 
 main()
@@ -2,7 +2,10 @@
 # Finding minimize of a non-linear function via Linear Approximations
 # The non-linear function is approximated by the piecewise linear functions
 # Solve minimize of f(x) = sin(x) * e^x in range [2, 8]
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from ortools.linear_solver import pywraplp
+import numpy as np
+import time
 
 
 # Points: 2D Array including value Bi in the respective Total Cost
@@ -45,10 +48,139 @@ def minimize_non_linear(func, left, right, precision):
         indices = [i - 1 for i in range(n) if G[i] > 0]
         left = points[max(0, indices[0])][0]
         # Simplify: left = points[max(0, [i - 1 for i in range(n) if G[i] > 0][0])][0]
-        right = points[min(n - 1, [i + 1 for i in range(n - 1, 0, -1) if G[i] > 0][0])][0]
+        right = points[min(n - 1, [i + 1 for i in range(n - 1, -1, -1) if G[i] > 0][0])][0]
     return x
 
 
+# Memoized evaluations of func, keyed on x: a point sampled in a previous
+# bracket is never evaluated again. Vectorized: func takes a NumPy array
+# of x and returns the array of values, all new points in one call
+def evaluate_cached(func, xs, cache, vectorized=False):
+    missing = [x for x in xs if x not in cache]
+    if missing:
+        if vectorized:
+            values = np.asarray(func(np.array(missing)), dtype=float)
+            cache.update(zip(missing, values.tolist()))
+        else:
+            for x in missing:
+                cache[x] = func(x)
+    return [cache[x] for x in xs]
+
+
+# Same search as minimize_non_linear without the LP: minimizing the
+# piecewise linear function over the sampled points puts all the weight δ
+# on the point with the lowest value, so the step is an argmin, and the
+# new bracket is the two segments around that point
+# Returns x, func(x) and the number of evaluations of func
+def minimize_non_linear_cached(func, left, right, precision, n=5, vectorized=False):
+    cache = {}
+    xs = np.linspace(left, right, n)
+    x, fx = left, None
+    while right - left > precision:
+        values = evaluate_cached(func, xs.tolist(), cache, vectorized)
+        i = int(np.argmin(values))
+        x, fx = xs[i], values[i]
+        left, right = xs[max(0, i - 1)], xs[min(n - 1, i + 1)]
+        # Snap the new grid onto the old points it meets, so they hit the cache
+        new = np.linspace(left, right, n)
+        close = np.isclose(new[:, None], xs[None, :], rtol=0,
+                           atol=1e-12 * max(1.0, abs(left), abs(right)))
+        rows, cols = np.nonzero(close)
+        new[rows] = xs[cols]
+        xs = new
+    if fx is None:
+        fx = evaluate_cached(func, [x], cache, vectorized)[0]
+    return float(x), fx, len(cache)
+
+
+def _minimize_bracket(func, left, right, precision, n, vectorized):
+    start = time.perf_counter()
+    x, fx, evaluations = minimize_non_linear_cached(func, left, right, precision,
+                                                    n, vectorized)
+    return {'left': left, 'right': right, 'x': x, 'value': fx,
+            'evaluations': evaluations, 'time': time.perf_counter() - start}
+
+
+# Multi-start: the domain is partitioned into brackets that are refined
+# concurrently, so that a local basin cannot hide the global minimum
+# Executor: 'thread' (func may be any callable, best with vectorized NumPy
+# functions that release the GIL) or 'process' (func must be picklable)
+# Returns the global best x, func(x) and the work spent on every bracket
+def minimize_non_linear_multistart(func, left, right, precision, brackets=16, n=5,
+                                   vectorized=False, executor='thread', workers=None):
+    edges = np.linspace(left, right, brackets + 1).tolist()
+    pool_type = ThreadPoolExecutor if executor == 'thread' else ProcessPoolExecutor
+    with pool_type(max_workers=workers) as pool:
+        futures = [pool.submit(_minimize_bracket, func, edges[k], edges[k + 1],
+                               precision, n, vectorized) for k in range(brackets)]
+        report = [future.result() for future in futures]
+    best = min(report, key=lambda r: r['value'])
+    return best['x'], best['value'], report
+
+
+# Separable functions f(x) = f0(x0) + f1(x1) + ... with linear constraints
+# Constraints: list of (coefficients, lower, upper): lower <= sum(c_k * x_k) <= upper
+# Every dimension has its own piecewise approximation (n points, weights δ)
+# and all of them are solved in one LP, then each bracket is narrowed
+# around the points that have weight, as in minimize_non_linear
+def minimize_separable(funcs, bounds, precision, constraints=(), n=9,
+                       max_iterations=100, vectorized=False):
+    dims = len(funcs)
+    left = np.array([b[0] for b in bounds], dtype=float)
+    right = np.array([b[1] for b in bounds], dtype=float)
+    caches = [{} for _ in range(dims)]
+    x = left.copy()
+    for _ in range(max_iterations):
+        if np.max(right - left) <= precision:
+            break
+        s = pywraplp.Solver('Separable Piecewise Linear',
+                            pywraplp.Solver.GLOP_LINEAR_PROGRAMMING)
+        points = [np.linspace(left[k], right[k], n) for k in range(dims)]
+        values = [evaluate_cached(funcs[k], points[k].tolist(), caches[k], vectorized)
+                  for k in range(dims)]
+        d = [[s.NumVar(0.0, 1, 'd[%i][%i]' % (k, i)) for i in range(n)] for k in range(dims)]
+        xv = [s.NumVar(left[k], right[k], 'x[%i]' % k) for k in range(dims)]
+        for k in range(dims):
+            s.Add(1 == sum(d[k][i] for i in range(n)))
+            s.Add(xv[k] == sum(d[k][i] * points[k][i] for i in range(n)))
+        for coefficients, lower, upper in constraints:
+            row = s.Constraint(lower, upper)
+            for k in range(dims):
+                row.SetCoefficient(xv[k], coefficients[k])
+        s.Minimize(s.Sum(d[k][i] * values[k][i] for k in range(dims) for i in range(n)))
+        if s.Solve() != pywraplp.Solver.OPTIMAL:
+            raise ValueError("The piecewise linear model has no optimal solution")
+        x = np.array([v.solution_value() for v in xv])
+        for k in range(dims):
+            support = [i for i in range(n) if d[k][i].solution_value() > 1e-9]
+            left[k] = points[k][max(0, support[0] - 1)]
+            right[k] = points[k][min(n - 1, support[-1] + 1)]
+    value = sum(evaluate_cached(funcs[k], [x[k]], caches[k], vectorized)[0]
+                for k in range(dims))
+    return x.tolist(), value, sum(len(cache) for cache in caches)
+
+
+# Evaluations of func and wall time of both minimizers per precision
+def benchmark_minimize(func, left, right, precisions=(0.05, 1e-3, 1e-6, 1e-9)):
+    print("{:>10}{:>8}{:>14}{:>12}{:>8}{:>14}{:>12}".format(
+        "Precision", "LP", "x", "Time (s)", "Cached", "x", "Time (s)"))
+    for precision in precisions:
+        calls = [0]
+
+        def counted(x):
+            calls[0] += 1
+            return func(x)
+
+        start = time.perf_counter()
+        x_lp = minimize_non_linear(counted, left, right, precision)
+        time_lp = time.perf_counter() - start
+        start = time.perf_counter()
+        x, fx, evaluations = minimize_non_linear_cached(func, left, right, precision)
+        time_cached = time.perf_counter() - start
+        print("{:>10g}{:>8}{:>14.8f}{:>12.5f}{:>8}{:>14.8f}{:>12.5f}".format(
+            precision, calls[0], x_lp, time_lp, evaluations, x, time_cached))
+
+
 def main():
     # Finding minimize of f(x) = sin(x) * e^x in range [2, 8]
     # Precision = 0.05
@@ -62,6 +194,29 @@ def main():
     x = minimize_non_linear(func, left, right, precision)
     print("Min at x: {:0.1f}".format(x))
     print("Min value: {:0.1f}".format(func(x)))
+    # Without the LP, with cached and vectorized evaluations
+    x, fx, evaluations = minimize_non_linear_cached(lambda v: np.sin(v) * np.exp(v),
+                                                    left, right, precision, vectorized=True)
+    print("Min at x: {:0.1f}, value: {:0.1f}, {} evaluations".format(x, fx, evaluations))
+    benchmark_minimize(func, left, right)
+    # A function with many basins: sin(5x) + 0.1x in range [0, 10]
+    def wavy(v):
+        return np.sin(5 * v) + 0.1 * v
+
+    x, fx, evaluations = minimize_non_linear_cached(wavy, 0, 10, 1e-6, vectorized=True)
+    print("Single bracket: min at x: {:0.4f}, value: {:0.4f}".format(x, fx))
+    x, fx, report = minimize_non_linear_multistart(wavy, 0, 10, 1e-6, vectorized=True)
+    print("Multi-start: min at x: {:0.4f}, value: {:0.4f}".format(x, fx))
+    for r in report:
+        print("  [{left:6.3f}, {right:6.3f}] x = {x:7.4f}, value = {value:8.4f}, "
+              "{evaluations} evaluations, {time:.5f} s".format(**r))
+    # Separable: sum of (x_k - k - 1)^2 + sin(3 x_k), with x0 + x1 + x2 <= 3
+    funcs = [lambda v, k=k: (v - k - 1) ** 2 + np.sin(3 * v) for k in range(3)]
+    x, fx, evaluations = minimize_separable(funcs, [(-5, 5)] * 3, 1e-6,
+                                            constraints=[([1, 1, 1], -np.inf, 3)])
+    print("Separable: min at x =", np.round(x, 4), "value: {:0.4f}, {} evaluations"
+          .format(fx, evaluations))
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 # Pattern Classification
 from ortools.linear_solver import pywraplp
+from ortools.linear_solver.python import model_builder
 import numpy as np
 import matplotlib.pyplot as plt
+import scipy.sparse
+import time
 
 
 # Given A is a set of data in a hyperplane
@@ -37,6 +40,92 @@ def solve_binary_classification(a, b):
     return status, obj_val, sol_val
 
 
+# Same model built in bulk: points (m x n) with signs +1 for A and -1 for B
+# Row i: sign_i * (x_i . a[:n] - a[n]) + y_i >= 1, the whole constraint
+# matrix [sign * X, -sign, I] is passed to the solver in one call
+def solve_binary_classification_matrix(points, signs, a_min=-99, a_max=99):
+    points = np.asarray(points, dtype=float)
+    signs = np.asarray(signs, dtype=float)
+    m, n = points.shape
+    model = model_builder.Model()
+    matrix = scipy.sparse.hstack([scipy.sparse.csr_matrix(signs[:, None] * points),
+                                  scipy.sparse.csr_matrix(-signs[:, None]),
+                                  scipy.sparse.identity(m, format="csr")], format="csr")
+    model.helper.fill_model_from_sparse_data(
+        np.concatenate([np.full(n + 1, a_min), np.zeros(m)]),
+        np.full(n + 1 + m, a_max),
+        np.concatenate([np.zeros(n + 1), np.ones(m)]),
+        np.ones(m), np.full(m, np.inf), matrix)
+    solver = model_builder.Solver('glop')
+    status = solver.solve(model)
+    if status != model_builder.SolveStatus.OPTIMAL:
+        return pywraplp.Solver.ABNORMAL, None, None
+    return (pywraplp.Solver.OPTIMAL, solver.objective_value,
+            [solver.value(model.var_from_index(j)) for j in range(n + 1)])
+
+
+# Constraint generation: a point whose margin constraint holds with y = 0
+# adds nothing to the objective, so the LP is solved on a subsample and the
+# points violating the margin (1 - sign * (x . a[:n] - a[n]) > tol) are added
+# until there is none left: the solution is then optimal for all the points
+# Batch: at most that many most violated points added per iteration
+# Returns the status, objective, solution and the indices of the active points
+def solve_binary_classification_active_set(a, b, initial=1000, batch=None, tol=1e-9,
+                                           max_iterations=100, seed=42):
+    points = np.concatenate([np.asarray(a, dtype=float), np.asarray(b, dtype=float)])
+    signs = np.concatenate([np.ones(len(a)), -np.ones(len(b))])
+    rng = np.random.default_rng(seed)
+    active = np.sort(np.concatenate([
+        rng.choice(len(a), min(initial, len(a)), replace=False),
+        len(a) + rng.choice(len(b), min(initial, len(b)), replace=False)]))
+    in_active = np.zeros(len(points), dtype=bool)
+    for _ in range(max_iterations):
+        in_active[active] = True
+        status, obj_val, sol_val = solve_binary_classification_matrix(points[active],
+                                                                      signs[active])
+        if status != pywraplp.Solver.OPTIMAL:
+            return status, None, None, active
+        # Vectorized margin check of every point
+        gap = 1 - signs * (points @ sol_val[:-1] - sol_val[-1])
+        violated = np.flatnonzero((gap > tol) & ~in_active)
+        if len(violated) == 0:
+            return status, float(np.maximum(gap, 0).sum()), sol_val, active
+        if batch is not None and len(violated) > batch:
+            violated = violated[np.argpartition(gap[violated], -batch)[-batch:]]
+        active = np.sort(np.concatenate([active, violated]))
+    return pywraplp.Solver.NOT_SOLVED, None, None, active
+
+
+# Two overlapping Gaussian classes in n dimensions
+def make_classes(m, n=2, seed=7):
+    rng = np.random.default_rng(seed)
+    shift = np.zeros(n)
+    shift[0] = 3
+    return rng.normal(0, 1, (m, n)), rng.normal(0, 1, (m, n)) + shift
+
+
+def benchmark_binary_classification(sizes=(10 ** 3, 10 ** 4, 10 ** 5), n=2,
+                                    original_limit=10 ** 4):
+    print("{:>8}{:>14}{:>12}{:>14}{:>10}{:>14}{:>12}".format(
+        "Points", "Original (s)", "Bulk (s)", "Active (s)", "Active", "Objective", "Gap"))
+    for m in sizes:
+        a, b = make_classes(m // 2, n)
+        original = np.nan
+        if m <= original_limit:  # One s.Sum row per point in Python
+            start = time.perf_counter()
+            solve_binary_classification(a, b)
+            original = time.perf_counter() - start
+        start = time.perf_counter()
+        _, full_obj, _ = solve_binary_classification_matrix(
+            np.concatenate([a, b]), np.concatenate([np.ones(len(a)), -np.ones(len(b))]))
+        bulk = time.perf_counter() - start
+        start = time.perf_counter()
+        _, obj_val, _, active = solve_binary_classification_active_set(a, b)
+        active_time = time.perf_counter() - start
+        print("{:>8}{:>14.3f}{:>12.3f}{:>14.3f}{:>10}{:>14.4f}{:>12.2e}".format(
+            m, original, bulk, active_time, len(active), obj_val, obj_val - full_obj))
+
+
 def main():
     # Sets of A, B
     # A = [[1, 2], [2, 4], [4, 9], [5, 6]
@@ -67,6 +156,9 @@ def main():
     y = (a[2] - a[0] * x) / a[1]
     plt.plot(x, y, color='green')
     plt.show()
+    if input("Run the large dataset benchmark? (y/n): ").strip().lower() == "y":
+        benchmark_binary_classification()
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,89 @@
 # Pattern Classification Revisited: Executable model
 # with maximizing the margin
 from ortools.linear_solver import pywraplp
+from ortools.linear_solver.python import model_builder
 import numpy as np
 import matplotlib.pyplot as plt
+import scipy.sparse
+import time
 
 
-def solve_margins_classification(class_a, class_b):
-    n = len(class_a[0])
-    ma, mb = len(class_a), len(class_b)
-    s = pywraplp.Solver('Classification with maximizing the margin'
-                        , pywraplp.Solver.GLOP_LINEAR_PROGRAMMING)
-    # Decision variables
-    ua = [s.NumVar(0, 99, '') for _ in range(ma)]
-    la = [s.NumVar(0, 99, '') for _ in range(ma)]
-    ub = [s.NumVar(0, 99, '') for _ in range(mb)]
-    lb = [s.NumVar(0, 99, '') for _ in range(mb)]
-    a = [s.NumVar(-99, 99, '') for _ in range(n + 1)]
-    e = s.NumVar(0, 99, 'e')
-    # Constraints, note: a[n] is a0 in the lesson
-    # a0 * x0 + a1 * x1 + ... = an
-    for i in range(ma):
-        # Constraints to force the data point x belongs to A
-        s.Add(0 >= a[n] + 1 - s.Sum(a[j] * class_a[i][j] for j in range(n)))
-        # Constraints to force the data point x belongs to hyperplane
-        s.Add(a[n] == s.Sum(a[j] * class_a[i][j] - ua[i] + la[i] for j in range(n)))
-        # e is the lower border of u, l
-        s.Add(ua[i] >= e)
-        s.Add(la[i] >= e)
-    for i in range(mb):
-        s.Add(0 >= s.Sum(a[j] * class_b[i][j] for j in range(n)) - a[n] + 1)
-        s.Add(a[n] == s.Sum(a[j] * class_b[i][j] - ub[i] + lb[i] for j in range(n)))
-        s.Add(ub[i] >= e)
-        s.Add(lb[i] >= e)
-    s.Minimize(e)
-    status = s.Solve()
-    sol_val = [v.solution_value() for v in a]
-    return status, sol_val
+# Margin t of the hyperplane a[:n] . x = a[n]: every point of A has
+# a[:n] . x - a[n] >= t and every point of B has a[n] - a[:n] . x >= t, up to
+# one slack per point. Maximize t - (sum of the slacks) / (nu * points), with
+# -1 <= a[j] <= 1 so that the margin cannot grow by scaling a. At most a
+# share nu of the points are inside the margin or misclassified (slack > 0)
+# Class_a, class_b: dense arrays or scipy sparse matrices (e.g. CSR) of the points
+# Row i: sign_i * (x_i . a[:n] - a[n]) + slack_i - t >= 0, the whole matrix
+# [sign * X, -sign, I, -1] is passed to the solver in one call
+# Timings: optional dict, filled with the build and solve times (s)
+def solve_margins_classification(class_a, class_b, nu=0.05, timings=None):
+    start = time.perf_counter()
+    class_a, class_b = scipy.sparse.csr_matrix(class_a), scipy.sparse.csr_matrix(class_b)
+    points = scipy.sparse.vstack([class_a, class_b], format="csr")
+    ma, mb = class_a.shape[0], class_b.shape[0]
+    m, n = points.shape
+    signs = np.concatenate([np.ones(ma), -np.ones(mb)])
+    matrix = scipy.sparse.hstack([scipy.sparse.diags(signs) @ points,
+                                  scipy.sparse.csr_matrix(-signs[:, None]),
+                                  scipy.sparse.identity(m, format="csr"),
+                                  scipy.sparse.csr_matrix(-np.ones((m, 1)))], format="csr")
+    # Variables: a[:n] in [-1, 1], a[n] free, slacks >= 0, t free
+    lower = np.concatenate([-np.ones(n), [-np.inf], np.zeros(m), [-np.inf]])
+    upper = np.concatenate([np.ones(n), [np.inf], np.full(m, np.inf), [np.inf]])
+    objective = np.concatenate([np.zeros(n + 1), np.full(m, -1 / (nu * m)), [1.0]])
+    model = model_builder.Model()
+    model.helper.fill_model_from_sparse_data(lower, upper, objective, np.zeros(m),
+                                             np.full(m, np.inf), matrix)
+    model.helper.set_maximize(True)
+    solver = model_builder.Solver('glop')
+    middle = time.perf_counter()
+    status = solver.solve(model)
+    if timings is not None:
+        timings['build'], timings['solve'] = middle - start, time.perf_counter() - middle
+    if status != model_builder.SolveStatus.OPTIMAL:
+        return pywraplp.Solver.ABNORMAL, None
+    sol_val = [solver.value(model.var_from_index(j)) for j in range(n + 1)]
+    return pywraplp.Solver.OPTIMAL, sol_val
+
+
+# Random sparse points (density: share of non-zero features), labelled by a
+# random hyperplane. About a share noise of the labels are flipped, among the
+# points closest to the hyperplane
+def make_sparse_classes(m, n, density=0.01, noise=0.02, seed=7):
+    rng = np.random.default_rng(seed)
+    points = scipy.sparse.random(m, n, density=density, format="csr", random_state=rng,
+                                 data_rvs=rng.standard_normal)
+    score = points @ rng.standard_normal(n)
+    near = np.abs(score) <= np.quantile(np.abs(score), 2 * noise)
+    labels = (score > 0) ^ (near & (rng.random(m) < 0.5))
+    return points[labels], points[~labels]
+
+
+# Build (matrix and model) and solve times. The former model had 4 (ma + mb)
+# rows and 4 (ma + mb) + n + 2 variables, this one ma + mb rows and
+# ma + mb + n + 2 variables
+# Cases: (points, features, density), density 1.0 for dense arrays
+def benchmark_margins(cases=((1000, 2, 1.0), (10000, 2, 1.0), (30000, 2, 1.0),
+                             (2000, 10000, 0.001), (5000, 1000, 0.01),
+                             (2000, 100000, 0.0005))):
+    print("{:>8}{:>10}{:>9}{:>9}{:>10}{:>11}{:>11}{:>10}".format(
+        "Points", "Features", "Density", "Rows", "Columns", "Build (s)", "Solve (s)",
+        "Accuracy"))
+    for m, n, density in cases:
+        if density == 1.0:
+            a, b = make_sparse_classes(m, n, 1.0)
+            a, b = a.toarray(), b.toarray()
+        else:
+            a, b = make_sparse_classes(m, n, density)
+        timings = {}
+        status, sol_val = solve_margins_classification(a, b, timings=timings)
+        x = scipy.sparse.vstack([scipy.sparse.csr_matrix(a), scipy.sparse.csr_matrix(b)])
+        f = x @ np.array(sol_val[:-1]) - sol_val[-1]
+        accuracy = np.mean(np.concatenate([f[:a.shape[0]] > 0, f[a.shape[0]:] < 0]))
+        print("{:>8}{:>10}{:>9}{:>9}{:>10}{:>11.3f}{:>11.3f}{:>10}".format(
+            m, n, density, m, m + n + 2, timings['build'], timings['solve'],
+            f"{accuracy:.1%}"))
 
 
 def main():
@@ -67,6 +115,9 @@ def main():
     y = (a[2] - a[0] * x) / a[1]
     plt.plot(x, y, color='green')
     plt.show()
+    if input("Run the benchmark? (y/n): ").strip().lower() == "y":
+        benchmark_margins()
 
 
-main()
+if __name__ == "__main__":
+    main()
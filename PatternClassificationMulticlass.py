@@ -0,0 +1,115 @@
+# Pattern Classification: many classes
+# One-vs-rest: one binary LP per class (the class as A, all the others as B),
+# one-vs-one: one binary LP per pair of classes. The LPs are independent and
+# are trained in worker processes sharing the training points. The learned
+# hyperplanes are kept as one weight matrix, so a batch of points is
+# classified by a single matrix product and an argmax (or vote count).
+from ortools.linear_solver import pywraplp
+from PatternClassification import solve_binary_classification_active_set
+from SharedMemoryPool import shared_data, shared_pool
+import itertools
+import numpy as np
+import os
+import tempfile
+import time
+
+
+# Hyperplane of class first against class second (or all the other classes
+# if second is None), scaled to a unit normal: x . w + bias is the signed
+# distance to the hyperplane, so the scores of different LPs are comparable
+def _train_binary(first, second):
+    data = shared_data()  # [points | labels]
+    points, labels = data[:, :-1], data[:, -1]
+    a = points[labels == first]
+    b = points[labels != first] if second is None else points[labels == second]
+    status, _, sol_val, _ = solve_binary_classification_active_set(a, b)
+    if status != pywraplp.Solver.OPTIMAL:
+        raise RuntimeError(f"No solution for class {first} against "
+                           f"{'the rest' if second is None else f'class {second}'}")
+    w = np.array(sol_val[:-1])
+    norm = max(np.linalg.norm(w), 1e-12)
+    return w / norm, -sol_val[-1] / norm
+
+
+# Points: (m, n) array, labels: class of every point
+# Strategy: 'ovr' (one-vs-rest) or 'ovo' (one-vs-one)
+# Returns the model: classes, weights (n, LPs), bias (LPs) and for 'ovo' the
+# pairs of class indices of every LP
+def train_multiclass(points, labels, strategy='ovr', processes=None):
+    points = np.asarray(points, dtype=float)
+    classes, labels = np.unique(labels, return_inverse=True)
+    if strategy == 'ovr':
+        tasks = [(c, None) for c in range(len(classes))]
+    elif strategy == 'ovo':
+        tasks = list(itertools.combinations(range(len(classes)), 2))
+    else:
+        raise ValueError(f"Invalid strategy {strategy!r}. Must be 'ovr' or 'ovo'")
+    with shared_pool([points, labels], processes=processes) as pool:
+        futures = [pool.submit(_train_binary, first, second) for first, second in tasks]
+        hyperplanes = [future.result() for future in futures]
+    return {'classes': classes, 'strategy': strategy,
+            'weights': np.stack([w for w, _ in hyperplanes], axis=1),
+            'bias': np.array([bias for _, bias in hyperplanes]),
+            'pairs': np.array(tasks if strategy == 'ovo' else [], dtype=int).reshape(-1, 2)}
+
+
+# Class of every point of a batch: one matrix product, then the largest
+# score (one-vs-rest) or the most votes (one-vs-one, first class on ties)
+def predict(model, points):
+    scores = np.asarray(points, dtype=float) @ model['weights'] + model['bias']
+    if model['strategy'] == 'ovr':
+        return model['classes'][np.argmax(scores, axis=1)]
+    pairs = model['pairs']
+    num_classes = len(model['classes'])
+    winners = np.where(scores > 0, pairs[:, 0], pairs[:, 1])  # (points, pairs)
+    winners += num_classes * np.arange(len(scores))[:, None]
+    votes = np.bincount(winners.ravel(), minlength=len(scores) * num_classes)
+    return model['classes'][np.argmax(votes.reshape(-1, num_classes), axis=1)]
+
+
+# Feature file: (items, n) .npy array, read chunk by chunk through a memory map
+# Yields the predicted classes of every chunk
+def predict_file(model, path, chunk_size=1 << 18):
+    features = np.load(path, mmap_mode="r")
+    for start in range(0, len(features), chunk_size):
+        yield predict(model, features[start:start + chunk_size])
+
+
+# Gaussian classes around random centers in n dimensions
+def make_multiclass(m, n=10, num_classes=20, spread=1.0, seed=7):
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(-10, 10, (num_classes, n))
+    labels = rng.integers(0, num_classes, m)
+    return centers[labels] + spread * rng.standard_normal((m, n)), labels
+
+
+def benchmark_multiclass(m=20_000, n=10, num_classes=20, items=2_000_000, processes=None):
+    points, labels = make_multiclass(m + items, n, num_classes)
+    points, test_points = points[:m], points[m:]
+    labels, test_labels = labels[:m], labels[m:]
+    print(f"{m} training points, {num_classes} classes, {n} features, "
+          f"{items} items to classify")
+    print("{:>9}{:>6}{:>14}{:>14}{:>14}{:>10}".format(
+        "Strategy", "LPs", "Training (s)", "Points/s", "Items/s", "Accuracy"))
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "features.npy")
+        np.save(path, test_points)
+        for strategy in ('ovr', 'ovo'):
+            start = time.perf_counter()
+            model = train_multiclass(points, labels, strategy, processes)
+            training = time.perf_counter() - start
+            start = time.perf_counter()
+            predicted = np.concatenate(list(predict_file(model, path)))
+            inference = time.perf_counter() - start
+            # Points/s: training points per second, over all the LPs
+            print("{:>9}{:>6}{:>14.2f}{:>14.0f}{:>14.0f}{:>10.2%}".format(
+                strategy, len(model['bias']), training, m / training, items / inference,
+                np.mean(predicted == test_labels)))
+
+
+def main():
+    benchmark_multiclass()
+
+
+if __name__ == "__main__":
+    main()
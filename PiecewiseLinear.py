@@ -1,5 +1,7 @@
 # Piecewise Linear: Executable model
 from ortools.linear_solver import pywraplp
+import numpy as np
+import time
 
 
 # Points: 2D Array including value Bi in the respective Total Cost
@@ -24,16 +26,64 @@ def minimize_piecewise_linear_convex(points, b):
     return R
 
 
+# Total cost of B: the cost at the breakpoint below B plus the rest of B
+# at the unit cost of its segment
 def calculate_cost(points, b, unit_cost):
-    for i in range(len(unit_cost), -1, -1):
+    for i in range(len(unit_cost) - 1, -1, -1):
         if points[i][0] < b:
-            total_cost = (b - points[i][0]) * unit_cost[i]
-            print(points[i][0], unit_cost[i])
-            print(total_cost)
+            return points[i][1] + (b - points[i][0]) * unit_cost[i]
+    return points[0][1]
 
 
+# Compiled tariff: breakpoints and the cumulative cost at each of them,
+# precomputed once from the unit cost of every segment
+def compile_tariff(breakpoints, unit_cost):
+    breakpoints = np.asarray(breakpoints, dtype=float)
+    slopes = np.asarray(unit_cost, dtype=float)
+    costs = np.concatenate([[0.0], np.cumsum(np.diff(breakpoints) * slopes)])
+    return {'breakpoints': breakpoints, 'costs': costs, 'slopes': slopes}
 
 
+# Evaluate an array of B at once (x >= B, at minimum cost x = B)
+# Returns the segment k of every B, the weight δ of its right breakpoint
+# (δk = 1 - weight, δk+1 = weight, the others are 0) and the total cost
+# Dense: return the full δ matrix (one row per B) instead of (k, weight)
+def evaluate_tariff(tariff, b, dense=False):
+    breakpoints, costs = tariff['breakpoints'], tariff['costs']
+    b = np.asarray(b, dtype=float)
+    if np.any(b > breakpoints[-1]):
+        raise ValueError("B is beyond the last breakpoint of the tariff")
+    x = np.maximum(b, breakpoints[0])
+    k = np.clip(np.searchsorted(breakpoints, x) - 1, 0, len(breakpoints) - 2)
+    weight = (x - breakpoints[k]) / (breakpoints[k + 1] - breakpoints[k])
+    total = costs[k] + (x - breakpoints[k]) * tariff['slopes'][k]
+    if dense:
+        delta = np.zeros(b.shape + (len(breakpoints),))
+        np.put_along_axis(delta, k[..., None], (1 - weight)[..., None], axis=-1)
+        np.put_along_axis(delta, k[..., None] + 1, weight[..., None], axis=-1)
+        return delta, total
+    return k, weight, total
+
+
+# Per-value LP against the compiled tariff
+def benchmark_tariff(points, unit_cost, lp_values=1000, sizes=(10 ** 5, 10 ** 6, 10 ** 7)):
+    tariff = compile_tariff([p[0] for p in points], unit_cost)
+    rng = np.random.default_rng(42)
+    b = rng.uniform(0, points[-1][0], lp_values)
+    start = time.perf_counter()
+    lp_cost = [sum(d * p[1] for d, p in zip(minimize_piecewise_linear_convex(points, v),
+                                             points)) for v in b]
+    lp_time = (time.perf_counter() - start) / lp_values
+    k, weight, total = evaluate_tariff(tariff, b)
+    print(f"LP: {lp_time * 1e6:.1f} us per value, "
+          f"max difference {np.max(np.abs(total - lp_cost)):.2e}")
+    for n in sizes:
+        b = rng.uniform(0, points[-1][0], n)
+        start = time.perf_counter()
+        evaluate_tariff(tariff, b)
+        elapsed = (time.perf_counter() - start) / n
+        print(f"Compiled tariff, {n} values: {elapsed * 1e9:.1f} ns per value, "
+              f"{lp_time / elapsed:.0f}x faster")
 
 
 def main():
@@ -59,7 +109,13 @@ def main():
     print("Summation of δ =", sum(R))
     print("x =", B)
     # Calculate the cost
-    calculate_cost(points, B, unit_cost)
+    print("Total cost =", calculate_cost(points, B, unit_cost))
+    # Compiled tariff: same δ and cost for many B at once
+    tariff = compile_tariff([p[0] for p in points], unit_cost)
+    delta, total = evaluate_tariff(tariff, [B], dense=True)
+    print("Compiled tariff: δ =", delta[0].tolist(), "Total cost =", total[0])
+    if input("Run the benchmark? (y/n): ").strip().lower() == "y":
+        benchmark_tariff(points, unit_cost)
 
 
 main()
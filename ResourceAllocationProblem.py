@@ -1,9 +1,13 @@
 # Resource Allocation Problem
 from ortools.linear_solver import pywraplp
+from SensitivityAnalysis import sensitivity_report
 
 
+# Sensitivity: also return the reduced costs, shadow prices (the value of
+# one more unit of each resource) and ranging of the same solve
 def solve_resource_allocation(num_resources, num_activities,
-                              profits, available_resources, costs):
+                              profits, available_resources, costs,
+                              sensitivity=False):
     solver = pywraplp.Solver.CreateSolver("GLOP")
     infinity = solver.Infinity()
     # Decision variables
@@ -26,6 +30,9 @@ def solve_resource_allocation(num_resources, num_activities,
                for a_idx in range(num_activities)]
     for a_idx in range(num_activities):
         print(f"opt_x[{a_idx + 1}] = {opt_sol[a_idx]: .2f}")
+    if sensitivity:
+        return status, opt_obj, opt_sol, sensitivity_report(solver)
+    return status, opt_obj, opt_sol
 
 
 def main():
@@ -36,8 +43,18 @@ def main():
     costs = [[90, 57, 51, 97, 67],
              [64, 58, 97, 56, 93],
              [55, 87, 77, 52, 51]]
-    solve_resource_allocation(num_resources, num_activities,
-                              profits, available_resources, costs)
+    status, opt_obj, opt_sol, report = solve_resource_allocation(
+        num_resources, num_activities, profits, available_resources, costs,
+        sensitivity=True)
+    for r_idx in range(num_resources):
+        low, high = report['rhs_ranges'][r_idx]
+        print(f"Resource {r_idx + 1}: shadow price = {report['shadow_prices'][r_idx]: .2f}, "
+              f"valid for availability in [{low: .2f}, {high: .2f}]")
+    for a_idx in range(num_activities):
+        low, high = report['objective_ranges'][a_idx]
+        print(f"Activity {a_idx + 1}: reduced cost = {report['reduced_costs'][a_idx]: .2f}, "
+              f"profit range [{low: .2f}, {high: .2f}]")
 
 
-main()
+if __name__ == "__main__":
+    main()
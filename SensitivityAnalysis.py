@@ -0,0 +1,176 @@
+# Sensitivity Analysis of Linear Programs
+# Reduced costs, shadow prices and objective/RHS ranging read from
+# the optimal basis of one GLOP solve, so that most what-if questions
+# (how far can a price move before the plan changes?) need no re-solve.
+# Price scenarios that leave the ranges are re-solved in a process pool,
+# each worker keeping one model alive so GLOP warm-starts from its last basis.
+from concurrent.futures import ProcessPoolExecutor
+import os
+from ortools.linear_solver import pywraplp
+from ortools.linear_solver import linear_solver_pb2
+import numpy as np
+
+
+def export_model(solver):
+    model = linear_solver_pb2.MPModelProto()
+    solver.ExportModelToProto(model)
+    return model
+
+
+def sensitivity_report(solver, tol=1e-9):
+    # The solver must already be solved to optimality (GLOP)
+    # Standard form: M z = 0 with M = [A | -I] and z = (x, row activities)
+    # Every column of z has bounds, the basis says which columns are basic
+    model = export_model(solver)
+    variables, constraints = solver.variables(), solver.constraints()
+    n, m = len(variables), len(constraints)
+    sense = -1.0 if model.maximize else 1.0  # Work in minimization form
+    c = np.array([v.objective_coefficient for v in model.variable])
+    A = np.zeros((m, n))
+    for i, row in enumerate(model.constraint):
+        A[i, list(row.var_index)] = list(row.coefficient)
+    M = np.hstack([A, -np.eye(m)])
+    cost = np.concatenate([sense * c, np.zeros(m)])
+    lower = np.array([v.lower_bound for v in model.variable]
+                     + [r.lower_bound for r in model.constraint])
+    upper = np.array([v.upper_bound for v in model.variable]
+                     + [r.upper_bound for r in model.constraint])
+    x = np.array([v.solution_value() for v in variables])
+    z = np.concatenate([x, A @ x])
+    status = np.array([v.basis_status() for v in variables]
+                      + [r.basis_status() for r in constraints])
+    basic = np.flatnonzero(status == pywraplp.Solver.BASIC)
+    if len(basic) != m:
+        raise ValueError("The solver did not return a complete basis")
+    # T = B^-1 M: the simplex tableau, y: simplex multipliers
+    B = M[:, basic]
+    T = np.linalg.solve(B, M)
+    y = np.linalg.solve(B.T, cost[basic])
+    d = cost - y @ M  # Reduced costs of every column (minimization form)
+    at_lower = status == pywraplp.Solver.AT_LOWER_BOUND
+    at_upper = status == pywraplp.Solver.AT_UPPER_BOUND
+    free = status == pywraplp.Solver.FREE
+    nonbasic = np.flatnonzero(status != pywraplp.Solver.BASIC)
+    # Objective ranging: the interval of each cost keeping the basis optimal
+    obj_ranges = np.empty((n, 2))
+    for j in range(n):
+        if status[j] == pywraplp.Solver.BASIC:
+            k = np.flatnonzero(basic == j)[0]
+            lo, hi = -np.inf, np.inf
+            for q in nonbasic:
+                alpha = T[k, q]
+                if abs(alpha) <= tol or status[q] == pywraplp.Solver.FIXED_VALUE:
+                    continue
+                if free[q]:
+                    lo, hi = 0.0, 0.0
+                    break
+                # d_q - delta * alpha must keep the sign required at its bound
+                ratio = d[q] / alpha
+                if at_lower[q] == (alpha > 0):
+                    hi = min(hi, ratio)
+                else:
+                    lo = max(lo, ratio)
+        elif at_lower[j]:
+            lo, hi = -d[j], np.inf
+        elif at_upper[j]:
+            lo, hi = -np.inf, -d[j]
+        elif free[j]:
+            lo, hi = 0.0, 0.0
+        else:  # Fixed variable, any cost keeps it where it is
+            lo, hi = -np.inf, np.inf
+        if sense < 0:  # Back to maximization: the interval flips
+            lo, hi = -hi, -lo
+        obj_ranges[j] = c[j] + lo, c[j] + hi
+    # RHS ranging: how far the active bound of each column can move
+    # before a basic column reaches one of its own bounds
+    rhs_ranges = np.empty((n + m, 2))
+    z_basic, l_basic, u_basic = z[basic], lower[basic], upper[basic]
+    for q in range(n + m):
+        if status[q] == pywraplp.Solver.BASIC:
+            # Inactive bound: free to move until it touches the activity
+            if np.isfinite(upper[q]):
+                rhs_ranges[q] = z[q], np.inf
+            else:
+                rhs_ranges[q] = -np.inf, z[q]
+            continue
+        lo, hi = -np.inf, np.inf
+        # z_B(delta) = z_B - delta * T[:, q] must stay within its bounds
+        for k in np.flatnonzero(np.abs(T[:, q]) > tol):
+            t = T[k, q]
+            a, b = (z_basic[k] - u_basic[k]) / t, (z_basic[k] - l_basic[k]) / t
+            if t < 0:
+                a, b = b, a
+            lo, hi = max(lo, a), min(hi, b)
+        rhs_ranges[q] = z[q] + lo, z[q] + hi
+    return {'objective_value': solver.Objective().Value(),
+            'solution': x,
+            'activities': z[n:],
+            'reduced_costs': sense * d[:n],
+            'shadow_prices': sense * y,
+            'objective_ranges': obj_ranges,
+            'bound_ranges': rhs_ranges[:n],
+            'rhs_ranges': rhs_ranges[n:]}
+
+
+# 100% rule: simultaneous changes keep the basis optimal if the sum of
+# each change relative to its allowable increase/decrease is at most 1
+def within_objective_ranges(report, new_c, c):
+    delta = np.asarray(new_c, dtype=float) - np.asarray(c, dtype=float)
+    low, high = report['objective_ranges'][:, 0], report['objective_ranges'][:, 1]
+    allowed = np.where(delta > 0, high - c, c - low)
+    changed = delta != 0
+    if np.any(allowed[changed] <= 0):
+        return False
+    return np.sum(np.abs(delta[changed]) / allowed[changed]) <= 1.0
+
+
+# One model per worker process, reused so every solve warm-starts
+_worker_solver = None
+
+
+def _init_worker(model_bytes):
+    global _worker_solver
+    model = linear_solver_pb2.MPModelProto()
+    model.ParseFromString(model_bytes)
+    _worker_solver = pywraplp.Solver.CreateSolver('GLOP')
+    _worker_solver.LoadModelFromProto(model)
+
+
+def _solve_objective(new_c):
+    objective = _worker_solver.Objective()
+    for var, coefficient in zip(_worker_solver.variables(), new_c):
+        objective.SetCoefficient(var, coefficient)
+    status = _worker_solver.Solve()
+    return (status, objective.Value(),
+            [v.solution_value() for v in _worker_solver.variables()])
+
+
+# Solver: an optimally solved model. Objectives: list of cost vectors
+# Returns (status, objective value, solution, re-solved?) per scenario
+def sweep_objectives(solver, objectives, processes=None, report=None):
+    if report is None:
+        report = sensitivity_report(solver)
+    model = export_model(solver)
+    c = np.array([v.objective_coefficient for v in model.variable])
+    offset = model.objective_offset
+    results = [None] * len(objectives)
+    pending = []
+    for s, new_c in enumerate(objectives):
+        if within_objective_ranges(report, new_c, c):
+            value = offset + float(np.dot(new_c, report['solution']))
+            results[s] = (pywraplp.Solver.OPTIMAL, value,
+                          list(report['solution']), False)
+        else:
+            pending.append(s)
+    if pending:
+        # Consecutive scenarios go to the same worker: neighbouring prices
+        # usually share the optimal basis, which makes the warm start cheap
+        workers = processes or os.cpu_count() or 1
+        chunk = max(1, len(pending) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(model.SerializeToString(),)) as pool:
+            solved = pool.map(_solve_objective, [list(objectives[s]) for s in pending],
+                              chunksize=chunk)
+            for s, (status, value, sol) in zip(pending, solved):
+                results[s] = (status, value, sol, True)
+    return results
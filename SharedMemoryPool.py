@@ -0,0 +1,47 @@
+# Process pools sharing one read-only NumPy array with their workers
+# The array is written once into shared memory by the parent, every worker
+# maps it when it starts (no copy per task), and the shared memory is
+# released when the pool is done, even on errors
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+import numpy as np
+
+# Shared array of the current worker process
+_shared = {}
+
+
+def _attach(name, shape, dtype):
+    _shared['memory'] = shared_memory.SharedMemory(name=name)
+    _shared['data'] = np.ndarray(shape, dtype=dtype, buffer=_shared['memory'].buf)
+
+
+# Shared array, in the worker processes of shared_pool
+def shared_data():
+    return _shared['data']
+
+
+# Blocks: arrays with the same number of rows (1-D arrays are one column),
+# written side by side into one (rows, columns) shared array
+# Yields a ProcessPoolExecutor whose workers see it through shared_data()
+@contextmanager
+def shared_pool(blocks, dtype=np.float64, processes=None):
+    blocks = [np.asarray(block).reshape(len(block), -1) for block in blocks]
+    shape = (len(blocks[0]), sum(block.shape[1] for block in blocks))
+    dtype = np.dtype(dtype)
+    memory = shared_memory.SharedMemory(create=True,
+                                        size=max(shape[0] * shape[1] * dtype.itemsize, 1))
+    try:
+        data = np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+        column = 0
+        for block in blocks:
+            data[:, column:column + block.shape[1]] = block
+            column += block.shape[1]
+        # No view may outlive the shared memory, and the caller may free its blocks
+        del data, blocks, block
+        with ProcessPoolExecutor(max_workers=processes, initializer=_attach,
+                                 initargs=(memory.name, shape, dtype.str)) as pool:
+            yield pool
+    finally:
+        memory.close()
+        memory.unlink()
@@ -0,0 +1,214 @@
+# Sudoku Problem: batch solving of puzzle files
+# Puzzles are read one line at a time, in either format:
+#   81 characters, digits 1-9 for the known values and 0 or . for empty cells
+#   (row, col, num) triples from 1, as in SudokuProblem, e.g. (1, 3, 6) (2, 3, 3)
+# Each worker process builds the full model (grid_size^3 variables) once and
+# reuses it for every puzzle: the givens and the candidates removed by the
+# propagation only change variable bounds. Uniqueness: the model is solved
+# again with a no-good row excluding the first solution, a second solution
+# means the puzzle is not valid.
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from ortools.linear_solver import pywraplp
+from SudokuProblem import sudoku_candidates, propagate, make_sudoku
+import itertools
+import numpy as np
+import os
+import re
+import tempfile
+import time
+
+_TRIPLE = re.compile(r"\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\)")
+_worker = {}
+
+
+# Returns the known values as (row, col, num) triples
+def parse_puzzle(line, grid_size=9):
+    line = line.strip()
+    if line.startswith("("):
+        m = [tuple(int(v) for v in triple) for triple in _TRIPLE.findall(line)]
+        if any(not (1 <= row <= grid_size and 1 <= col <= grid_size and 0 <= num <= grid_size)
+               for row, col, num in m):
+            raise ValueError(f"Invalid triple in {line!r}")
+        return m
+    if len(line) != grid_size * grid_size or any(ch not in ".0123456789" for ch in line):
+        raise ValueError(f"Invalid puzzle line {line!r}. Must be {grid_size * grid_size} "
+                         "characters, digits or . for empty cells")
+    return [(i // grid_size + 1, i % grid_size + 1, int(ch))
+            for i, ch in enumerate(line) if ch not in ".0"]
+
+
+def format_solution(sudoku_sol):
+    return "".join(str(num) for num in np.ravel(sudoku_sol))
+
+
+# Puzzles: (line number, line) of the non-empty lines, read lazily
+def read_puzzles(path):
+    with open(path) as file:
+        for number, line in enumerate(file, 1):
+            if line.strip():
+                yield number, line
+
+
+def _init_worker(grid_size, subgrid_size, backend):
+    n, b = grid_size, subgrid_size
+    solver = pywraplp.Solver.CreateSolver(backend) or pywraplp.Solver.CreateSolver("SCIP")
+    x = np.array([[[solver.BoolVar(f"x_{row, col, num}") for num in range(n)]
+                   for col in range(n)] for row in range(n)], dtype=object)
+    for i in range(n):
+        for j in range(n):
+            solver.Add(solver.Sum(x[i, j, :].tolist()) == 1)  # Cell (i, j)
+            solver.Add(solver.Sum(x[i, :, j].tolist()) == 1)  # Number j in row i
+            solver.Add(solver.Sum(x[:, i, j].tolist()) == 1)  # Number j in column i
+            top, left = (i // b) * b, (i % b) * b
+            solver.Add(solver.Sum(x[top:top + b, left:left + b, j].ravel().tolist()) == 1)
+    # The no-good row is inactive (free bounds) unless checking uniqueness
+    nogood = solver.Constraint(-solver.infinity(), solver.infinity())
+    _worker.update(solver=solver, x=x, nogood=nogood, grid_size=n, subgrid_size=b)
+
+
+def _read_solution(x):
+    values = np.array([var.solution_value() for var in x.ravel()]).reshape(x.shape)
+    return np.argmax(values, axis=2) + 1
+
+
+# Returns (status, solution): status is 'unique', 'multiple', 'no solution'
+# or 'invalid' (a line that cannot be parsed), checked when check_unique
+def solve_puzzle(line, check_unique=True):
+    solver, x, nogood = _worker['solver'], _worker['x'], _worker['nogood']
+    n, b = _worker['grid_size'], _worker['subgrid_size']
+    try:
+        m = parse_puzzle(line, n)
+    except ValueError:
+        return 'invalid', None
+    cand = propagate(sudoku_candidates(n, [m]), b)
+    if cand is None:
+        return 'no solution', None
+    fixed = cand.sum(axis=2) == 1
+    if fixed.all():  # Solved by forced moves only: the solution is unique
+        return 'unique', np.argmax(cand, axis=2) + 1
+    lower = (cand & fixed[:, :, None]).ravel()
+    upper = cand.ravel()
+    for var, lb, ub in zip(x.ravel(), lower, upper):
+        var.SetBounds(float(lb), float(ub))
+    status = solver.Solve()
+    if status not in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
+        return 'no solution', None
+    sudoku_sol = _read_solution(x)
+    if not check_unique:
+        return 'solved', sudoku_sol
+    # Another solution must change at least one of the free cells
+    free = np.argwhere(~fixed)
+    nogood.Clear()
+    for row, col in free.tolist():
+        nogood.SetCoefficient(x[row, col, sudoku_sol[row, col] - 1], 1)
+    nogood.SetBounds(-solver.infinity(), len(free) - 1)
+    status = solver.Solve()
+    nogood.SetBounds(-solver.infinity(), solver.infinity())
+    if status in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
+        return 'multiple', sudoku_sol
+    return 'unique', sudoku_sol
+
+
+def _solve_batch(batch, check_unique):
+    results = []
+    for number, line in batch:
+        start = time.perf_counter()
+        status, sudoku_sol = solve_puzzle(line, check_unique)
+        results.append((number, status, sudoku_sol, time.perf_counter() - start))
+    return results
+
+
+# Latency histogram: log-spaced bins in milliseconds
+def latency_histogram(latencies, bins=(0.1, 0.3, 1, 3, 10, 30, 100, 300, 1000)):
+    edges = np.concatenate([[0.0], bins, [np.inf]])
+    counts, _ = np.histogram(np.asarray(latencies) * 1000, edges)
+    return edges, counts
+
+
+# Solves every puzzle of input_path and writes one line per puzzle to
+# output_path, in input order: line number, status, solution, latency (ms)
+# Only max_pending batches are in flight, so the input is never fully loaded
+def solve_sudoku_file(input_path, output_path, grid_size=9, subgrid_size=None,
+                      backend='CP-SAT', check_unique=True, batch_size=64,
+                      processes=None, max_pending=None):
+    if subgrid_size is None:
+        subgrid_size = int(round(grid_size ** 0.5))
+    processes = processes or os.cpu_count()
+    max_pending = max_pending or 4 * processes
+    summary = {'puzzles': 0, 'statuses': {}}
+    latencies = []
+    start = time.perf_counter()
+    puzzles = read_puzzles(input_path)
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                             initargs=(grid_size, subgrid_size, backend)) as pool, \
+            open(output_path, "w") as output:
+        pending = deque()
+
+        def write_oldest():
+            for number, status, sudoku_sol, latency in pending.popleft().result():
+                solution = "-" if sudoku_sol is None else format_solution(sudoku_sol)
+                output.write(f"{number}\t{status}\t{solution}\t{latency * 1000:.3f}\n")
+                summary['statuses'][status] = summary['statuses'].get(status, 0) + 1
+                latencies.append(latency)
+
+        while True:
+            batch = list(itertools.islice(puzzles, batch_size))
+            if not batch:
+                break
+            pending.append(pool.submit(_solve_batch, batch, check_unique))
+            summary['puzzles'] += len(batch)
+            if len(pending) >= max_pending:
+                write_oldest()
+        while pending:
+            write_oldest()
+    summary['seconds'] = time.perf_counter() - start
+    summary['puzzles_per_second'] = summary['puzzles'] / summary['seconds']
+    summary['histogram'] = latency_histogram(latencies)
+    summary['latency_p50'], summary['latency_p99'] = (
+        np.percentile(latencies, [50, 99]) if latencies else (0.0, 0.0))
+    return summary
+
+
+def print_summary(summary):
+    print(f"{summary['puzzles']} puzzles in {summary['seconds']:.2f} s: "
+          f"{summary['puzzles_per_second']:.1f} puzzles/s, "
+          f"p50 = {summary['latency_p50'] * 1000:.2f} ms, "
+          f"p99 = {summary['latency_p99'] * 1000:.2f} ms")
+    print("  ".join(f"{status}: {count}" for status, count in
+                    sorted(summary['statuses'].items())))
+    edges, counts = summary['histogram']
+    for low, high, count in zip(edges[:-1], edges[1:], counts):
+        print("{:>8} - {:<8} ms {:>8}".format(f"{low:g}", f"{high:g}", count))
+
+
+# Random 9x9 puzzles in both formats, a share with several solutions
+def write_puzzle_file(path, count, keep=(0.38, 0.5), seed=42):
+    rng = np.random.default_rng(seed)
+    with open(path, "w") as file:
+        for i in range(count):
+            m = [value for row in make_sudoku(3, rng.uniform(*keep), seed + i) for value in row]
+            if i % 2:
+                file.write(" ".join(f"({row}, {col}, {num})" for row, col, num in m) + "\n")
+            else:
+                grid = np.zeros((9, 9), dtype=int)
+                for row, col, num in m:
+                    grid[row - 1, col - 1] = num
+                file.write(format_solution(grid).replace("0", ".") + "\n")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        input_path = os.path.join(folder, "puzzles.txt")
+        output_path = os.path.join(folder, "solutions.txt")
+        write_puzzle_file(input_path, 2000)
+        summary = solve_sudoku_file(input_path, output_path)
+        print_summary(summary)
+        with open(output_path) as file:
+            print("First results:")
+            for line in itertools.islice(file, 3):
+                print(line.rstrip())
+
+
+if __name__ == "__main__":
+    main()
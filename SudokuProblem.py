@@ -1,68 +1,176 @@
 # Sudoku Problem (Possible solutions)
 import numpy as np
+import time
 from ortools.linear_solver import pywraplp
 
 
-def solve_sudoku(grid_size, m):
-    # Create solver
-    solver = pywraplp.Solver.CreateSolver("SCIP")
-    # Decision variables
-    sudoku_vars = np.empty((grid_size, grid_size, grid_size), dtype=object)
-    for row in range(grid_size):
-        for col in range(grid_size):
-            for num in range(grid_size):
-                sudoku_vars[row][col][num] = solver.Var(0, 1, integer=True,
-                                                        name=f"x_{row, col, num}")
-    # Objective Functions
-    solver.Minimize(0)
-    # Constraints
-    # Row of the sudoku board must be within 1 to 9
-    for row in range(grid_size):
-        for num in range(grid_size):
-            solver.Add(solver.Sum([sudoku_vars[row][col][num]
-                                   for col in range(grid_size)]) == 1)
-    # Column of the sudoku board must be within 1 to 9
-    for col in range(grid_size):
-        for num in range(grid_size):
-            solver.Add(solver.Sum([sudoku_vars[row][col][num]
-                                   for row in range(grid_size)]) == 1)
-    # 9x9 Grid of the sudoku board must be within 1 to 9
-    for row in range(grid_size):
-        for col in range(grid_size):
-            solver.Add(solver.Sum([sudoku_vars[row][col][num]
-                                   for num in range(grid_size)]) == 1)
-    # Each number in each row, col in the board only appears one time
-    for row in range(grid_size):
-        known_values = m[row]
-        for value in known_values:
-            row, col, num = value
-            solver.Add(sudoku_vars[row - 1][col - 1][num - 1] == 1)
-    # Solve the problem
+# Candidates cand[row][col][num]: True if num + 1 can still go to (row, col)
+# M: the known values as (row, col, num) from 1, num 0 is an empty cell
+def sudoku_candidates(grid_size, m):
+    cand = np.ones((grid_size, grid_size, grid_size), dtype=bool)
+    for known_values in m:
+        for row, col, num in known_values:
+            if num > 0:
+                cand[row - 1][col - 1] = False
+                cand[row - 1][col - 1][num - 1] = True
+    return cand
+
+
+# Candidates grouped by sub-grid: [box][cell in the box][num]
+def _boxes(cand, subgrid_size):
+    b, n = subgrid_size, len(cand)
+    return cand.reshape(b, b, b, b, n).transpose(0, 2, 1, 3, 4).reshape(n, n, n)
+
+
+# Constraint propagation before the solver:
+# naked single: a cell with only one candidate gets that number
+# hidden single: a number with only one possible cell in a row, column or
+# sub-grid goes to that cell. Placing a number removes it from its peers
+# Returns the reduced candidates, or None if the puzzle has no solution
+def propagate(cand, subgrid_size):
+    cand = cand.copy()
+    n, b = len(cand), subgrid_size
+    placed = np.zeros((n, n), dtype=bool)
+    while True:
+        boxes = _boxes(cand, b)
+        counts = [cand.sum(axis=2), cand.sum(axis=1), cand.sum(axis=0), boxes.sum(axis=1)]
+        if any((count == 0).any() for count in counts):
+            return None
+        assign = set()
+        for row, col in np.argwhere((counts[0] == 1) & ~placed):
+            assign.add((row, col, np.argmax(cand[row, col])))
+        for row, num in np.argwhere(counts[1] == 1):
+            assign.add((row, np.argmax(cand[row, :, num]), num))
+        for col, num in np.argwhere(counts[2] == 1):
+            assign.add((np.argmax(cand[:, col, num]), col, num))
+        for box, num in np.argwhere(counts[3] == 1):
+            cell = np.argmax(boxes[box, :, num])
+            assign.add(((box // b) * b + cell // b, (box % b) * b + cell % b, num))
+        assign = [(row, col, num) for row, col, num in assign if not placed[row, col]]
+        if not assign:
+            return cand
+        for row, col, num in assign:
+            if not cand[row, col, num]:  # Removed by another number of this round
+                return None
+            top, left = (row // b) * b, (col // b) * b
+            cand[row, :, num] = False
+            cand[:, col, num] = False
+            cand[top:top + b, left:left + b, num] = False
+            cand[row, col] = False
+            cand[row, col, num] = True
+            placed[row, col] = True
+
+
+# Only the remaining candidates of the unsolved cells become variables
+# Backend: 'CP-SAT' if available in this OR-Tools build, otherwise SCIP
+# Returns the solution grid (or None) and the number of variables
+def solve_candidates(cand, subgrid_size, backend='CP-SAT'):
+    n, b = len(cand), subgrid_size
+    fixed = cand.sum(axis=2) == 1
+    sudoku_sol = np.argmax(cand, axis=2) + 1
+    # Units already holding a fixed number need no constraint, and their
+    # other cells cannot take that number
+    done = cand & fixed[:, :, None]
+    row_done, col_done = done.any(axis=1), done.any(axis=0)
+    box_done = _boxes(done, b).any(axis=1)
+    box_of = (np.arange(n)[:, None] // b) * b + np.arange(n)[None, :] // b
+    free = cand & ~fixed[:, :, None] & ~row_done[:, None, :] & ~col_done[None, :, :] \
+        & ~box_done[box_of]
+    free = np.argwhere(free)
+    if len(free) == 0:
+        return sudoku_sol, 0
+    solver = pywraplp.Solver.CreateSolver(backend) or pywraplp.Solver.CreateSolver("SCIP")
+    cells, rows, cols, boxes = {}, {}, {}, {}
+    sudoku_vars = {}
+    for row, col, num in free.tolist():
+        var = solver.BoolVar(f"x_{row, col, num}")
+        sudoku_vars[row, col, num] = var
+        cells.setdefault((row, col), []).append(var)
+        rows.setdefault((row, num), []).append(var)
+        cols.setdefault((col, num), []).append(var)
+        boxes.setdefault((box_of[row, col], num), []).append(var)
+    # Each cell holds one number
+    for key in cells:
+        solver.Add(solver.Sum(cells[key]) == 1)
+    # Each number appears once in every row, column and sub-grid
+    for unit, unit_done in ((rows, row_done), (cols, col_done), (boxes, box_done)):
+        for index, num in np.argwhere(~unit_done).tolist():
+            solver.Add(solver.Sum(unit.get((index, num), [])) == 1)
     status = solver.Solve()
     if status == pywraplp.Solver.OPTIMAL or status == pywraplp.Solver.FEASIBLE:
-        sudoku_sol = np.zeros((grid_size, grid_size), dtype=int)
-        for row in range(grid_size):
-            for col in range(grid_size):
-                for num in range(grid_size):
-                    if sudoku_vars[row][col][num].solution_value() == 1:
-                        sudoku_sol[row][col] = num + 1
-        return sudoku_sol
-    else:
-        return None
-
-
-grid_size = 9
-subgrid_size = 3
-M = [[(1, 3, 6)],
-     [(2, 3, 3)],
-     [(3, 1, 5), (3, 7, 3), (3, 8, 7), (3, 9, 9)],
-     [(4, 1, 2), (4, 2, 1), (4, 3, 4), (4, 4, 0)],
-     [(5, 6, 5), (5, 7, 4)],
-     [(6, 1, 3), (6, 2, 5), (6, 3, 8), (6, 7, 9)],
-     [(7, 1, 4), (7, 9, 2)],
-     [(8, 3, 5)],
-     [(9, 1, 8), (9, 2, 2)]]
-# Display the result
-solution = solve_sudoku(grid_size, M)
-if solution is not None:  # However, not the right solution
-    print(solution)
+        for (row, col, num), var in sudoku_vars.items():
+            if var.solution_value() > 0.5:
+                sudoku_sol[row][col] = num + 1
+        return sudoku_sol, len(sudoku_vars)
+    return None, len(sudoku_vars)
+
+
+def solve_sudoku(grid_size, m, subgrid_size=None, backend='CP-SAT', presolve=True):
+    if subgrid_size is None:
+        subgrid_size = int(round(grid_size ** 0.5))
+    cand = sudoku_candidates(grid_size, m)
+    if presolve:
+        cand = propagate(cand, subgrid_size)
+        if cand is None:
+            return None
+    return solve_candidates(cand, subgrid_size, backend)[0]
+
+
+# A random puzzle: a valid grid with the numbers shuffled, keeping a share
+# of the cells as known values (possibly with several solutions)
+def make_sudoku(subgrid_size, keep=0.5, seed=42):
+    rng = np.random.default_rng(seed)
+    b = subgrid_size
+    n = b * b
+    grid = np.array([[(b * (r % b) + r // b + c) % n for c in range(n)] for r in range(n)])
+    grid = rng.permutation(n)[grid] + 1
+    rows = np.concatenate([band * b + rng.permutation(b) for band in rng.permutation(b)])
+    cols = np.concatenate([stack * b + rng.permutation(b) for stack in rng.permutation(b)])
+    grid = grid[rows][:, cols]
+    return [[(r + 1, c + 1, int(grid[r, c])) for c in range(n) if rng.random() < keep]
+            for r in range(n)]
+
+
+# Variables: the original model has grid_size^3 variables, the candidates
+# model only the candidates left by the givens, or by the propagation
+def benchmark_sudoku(subgrid_sizes=(3, 4, 5), keep=0.45):
+    print("{:>7}{:>9}{:>10}{:>11}{:>11}{:>14}{:>11}".format(
+        "Grid", "Backend", "Presolve", "Original", "Variables", "Presolve (s)", "Solve (s)"))
+    for b in subgrid_sizes:
+        n = b * b
+        m = make_sudoku(b, keep)
+        for backend in ('SCIP', 'CP-SAT'):
+            for presolve in (False, True):
+                start = time.perf_counter()
+                cand = sudoku_candidates(n, m)
+                if presolve:
+                    cand = propagate(cand, b)
+                middle = time.perf_counter()
+                sudoku_sol, num_vars = solve_candidates(cand, b, backend)
+                end = time.perf_counter()
+                print("{:>7}{:>9}{:>10}{:>11}{:>11}{:>14.4f}{:>11.4f}".format(
+                    f"{n}x{n}", backend, str(presolve), n ** 3, num_vars,
+                    middle - start, end - middle))
+
+
+def main():
+    grid_size = 9
+    subgrid_size = 3
+    M = [[(1, 3, 6)],
+         [(2, 3, 3)],
+         [(3, 1, 5), (3, 7, 3), (3, 8, 7), (3, 9, 9)],
+         [(4, 1, 2), (4, 2, 1), (4, 3, 4), (4, 4, 0)],
+         [(5, 6, 5), (5, 7, 4)],
+         [(6, 1, 3), (6, 2, 5), (6, 3, 8), (6, 7, 9)],
+         [(7, 1, 4), (7, 9, 2)],
+         [(8, 3, 5)],
+         [(9, 1, 8), (9, 2, 2)]]
+    # Display the result
+    solution = solve_sudoku(grid_size, M, subgrid_size)
+    if solution is not None:  # A valid solution, sub-grids included
+        print(solution)
+    benchmark_sudoku()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,30 @@
 # Workforce Planning Problem
 from ortools.linear_solver import pywraplp
+import numpy as np
+import time
 
 
-def solve_workforce_planning(num_periods, num_patterns, requirements, costs, patterns):
+# Patterns: sets of periods, or (first, last) intervals of contiguous periods
+# Returns a (num_periods x num_patterns) bitmap: cover[t][p] if p works at t + 1
+def coverage_index(num_periods, patterns):
+    cover = np.zeros((num_periods, len(patterns)), dtype=bool)
+    intervals = [p for p in range(len(patterns)) if isinstance(patterns[p], tuple)]
+    if intervals:
+        # Difference array: +1 at the first period, -1 after the last period
+        diff = np.zeros((num_periods + 1, len(intervals)), dtype=np.int32)
+        first = np.array([patterns[p][0] for p in intervals]) - 1
+        last = np.array([patterns[p][1] for p in intervals])
+        diff[first, np.arange(len(intervals))] += 1
+        diff[last, np.arange(len(intervals))] -= 1
+        cover[:, intervals] = np.cumsum(diff, axis=0)[:num_periods] > 0
+    for p in range(len(patterns)):
+        if not isinstance(patterns[p], tuple):
+            cover[np.fromiter(patterns[p], dtype=int) - 1, p] = True
+    return cover
+
+
+def solve_workforce_planning(num_periods, num_patterns, requirements, costs, patterns,
+                             verbose=True):
     solver = pywraplp.Solver.CreateSolver('GLOP')
     infinity = solver.Infinity()
     # Decision variables
@@ -11,15 +33,114 @@ def solve_workforce_planning(num_periods, num_patterns, requirements, costs, pat
     # Objective function
     solver.Minimize(solver.Sum([costs[p] * var_p[p] for p in range(num_patterns)]))
     # Constraints
+    cover = coverage_index(num_periods, patterns)
     for t in range(num_periods):
-        solver.Add(solver.Sum([var_p[p] for p in range(num_patterns)
-                               if (t + 1) in patterns[p]]) >= requirements[t])
+        solver.Add(solver.Sum([var_p[p] for p in np.flatnonzero(cover[t])])
+                   >= requirements[t])
     # Solve the problem and retrieve optimal solution
     status = solver.Solve()
-    if status == pywraplp.Solver.OPTIMAL:
+    if status == pywraplp.Solver.OPTIMAL and verbose:
         print(f"Objective = {solver.Objective().Value()}")
         for p in range(num_patterns):
             print(f"var_{p + 1} = {var_p[p].solution_value()}")
+    return (status, solver.Objective().Value(),
+            [var_p[p].solution_value() for p in range(num_patterns)])
+
+
+# Pricing subproblem of the column generation
+# Reduced cost of the shift (first, last) = shift_cost[length] - sum of duals
+# With prefix sums of the duals, every start is priced at once per length,
+# keeping the best length for each start: O(num_periods * lengths)
+def price_shifts(duals, shift_cost, min_length, max_length, count=1, tol=1e-9):
+    num_periods = len(duals)
+    prefix = np.concatenate([[0.0], np.cumsum(duals)])
+    best = np.full(num_periods, np.inf)
+    best_length = np.zeros(num_periods, dtype=int)
+    for length in range(min_length, min(max_length, num_periods) + 1):
+        reduced = shift_cost[length] - (prefix[length:] - prefix[:-length])
+        better = reduced < best[:len(reduced)]
+        best[:len(reduced)][better] = reduced[better]
+        best_length[:len(reduced)][better] = length
+    # The most negative shifts, at most one per start period
+    candidates = np.flatnonzero(best < -tol)
+    if len(candidates) > count:
+        candidates = candidates[np.argpartition(best[candidates], count - 1)[:count]]
+    return [(start + 1, start + best_length[start], best[start])
+            for start in candidates[np.argsort(best[candidates])]]
+
+
+# Shift patterns are contiguous shifts of min_length to max_length periods
+# Shift_cost[length]: cost of one shift of that length
+# Starts from a small pool of patterns and adds the shifts priced by the duals
+def solve_workforce_column_generation(num_periods, requirements, shift_cost,
+                                      min_length, max_length, patterns=None,
+                                      columns_per_iteration=20, max_iterations=1000,
+                                      integer=False):
+    if num_periods < min_length:
+        raise ValueError(f"Invalid min_length {min_length}. No shift of at least "
+                         f"{min_length} periods fits in {num_periods} periods")
+    solver = pywraplp.Solver.CreateSolver('GLOP')
+    infinity = solver.Infinity()
+    rows = [solver.Constraint(float(requirements[t]), infinity)
+            for t in range(num_periods)]
+    objective = solver.Objective()
+    objective.SetMinimization()
+    pool, var_p = [], []
+
+    def add_shift(first, last):
+        var = solver.NumVar(0, infinity, f"x_{len(pool)}")
+        objective.SetCoefficient(var, shift_cost[last - first + 1])
+        for t in range(first - 1, last):  # Coverage: the interval only
+            rows[t].SetCoefficient(var, 1)
+        pool.append((first, last))
+        var_p.append(var)
+
+    if patterns is None:
+        # Initial pool: the longest shifts laid end to end over the horizon
+        patterns = []
+        for first in range(1, num_periods + 1, max_length):
+            last = min(first + max_length - 1, num_periods)
+            patterns.append((max(1, min(first, last - min_length + 1)), last))
+    for first, last in patterns:
+        add_shift(first, last)
+    status, iterations = solver.Solve(), 1
+    while status == pywraplp.Solver.OPTIMAL and iterations < max_iterations:
+        duals = np.array([row.dual_value() for row in rows])
+        shifts = price_shifts(duals, shift_cost, min_length, max_length,
+                              columns_per_iteration)
+        if not shifts:  # No shift with a negative reduced cost: LP optimum
+            break
+        for first, last, _ in shifts:
+            add_shift(first, last)
+        status = solver.Solve()  # Warm start from the previous basis
+        iterations += 1
+    obj_val = objective.Value()
+    values = [var.solution_value() for var in var_p]
+    if integer and status == pywraplp.Solver.OPTIMAL:
+        # Integer staffing over the generated pool (price-and-branch)
+        status, obj_val, values = solve_integer_patterns(
+            num_periods, requirements, [shift_cost[last - first + 1] for first, last in pool],
+            pool)
+    return status, obj_val, pool, values, iterations
+
+
+def solve_integer_patterns(num_periods, requirements, costs, patterns):
+    solver = pywraplp.Solver.CreateSolver('SCIP')
+    var_p = [solver.IntVar(0, solver.infinity(), f"x_{p}") for p in range(len(patterns))]
+    solver.Minimize(solver.Sum([costs[p] * var_p[p] for p in range(len(patterns))]))
+    cover = coverage_index(num_periods, patterns)
+    for t in range(num_periods):
+        solver.Add(solver.Sum([var_p[p] for p in np.flatnonzero(cover[t])])
+                   >= requirements[t])
+    status = solver.Solve()
+    return status, solver.Objective().Value(), [var.solution_value() for var in var_p]
+
+
+# A 24x7 roster in quarter hours: demand peaks during the day
+def make_requirements(num_periods, seed=42):
+    rng = np.random.default_rng(seed)
+    hours = np.arange(num_periods) / 4 % 24
+    return np.round(10 + 8 * np.sin((hours - 8) * np.pi / 12) + rng.integers(0, 4, num_periods))
 
 
 def main():
@@ -33,6 +154,25 @@ def main():
                 set([4, 5, 6, 7]),
                 set([7, 8, 9, 10])]
     solve_workforce_planning(num_periods, num_patterns, requirements, costs, patterns)
+    # Column generation: 672 quarter-hour periods, shifts of 4 to 10 hours
+    num_periods, min_length, max_length = 672, 16, 40
+    requirements = make_requirements(num_periods)
+    shift_cost = [8 + length for length in range(max_length + 1)]  # Fixed + hourly
+    start = time.perf_counter()
+    status, obj_val, pool, values, iterations = solve_workforce_column_generation(
+        num_periods, requirements, shift_cost, min_length, max_length)
+    print(f"Column generation: objective = {obj_val:.2f}, {iterations} iterations, "
+          f"{len(pool)} patterns, {time.perf_counter() - start:.2f} s")
+    # Full enumeration of every contiguous shift, for comparison
+    start = time.perf_counter()
+    patterns = [(first, first + length - 1) for length in range(min_length, max_length + 1)
+                for first in range(1, num_periods - length + 2)]
+    status, obj_val, values = solve_workforce_planning(
+        num_periods, len(patterns), requirements,
+        [shift_cost[last - first + 1] for first, last in patterns], patterns, verbose=False)
+    print(f"Full enumeration: objective = {obj_val:.2f}, {len(patterns)} patterns, "
+          f"{time.perf_counter() - start:.2f} s")
 
 
-main()
+if __name__ == "__main__":
+    main()
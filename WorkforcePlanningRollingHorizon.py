@@ -0,0 +1,103 @@
+# Workforce Planning Problem: Rolling Horizon
+# A year of quarter-hour periods (35,040) is too large for one model
+# The horizon is solved as overlapping windows: each window commits the shifts
+# starting in its first `commit` periods, and the part of those shifts that
+# runs past the commit boundary is carried into the next window as coverage
+# that is already paid for. The rest of the window is solved again next time.
+from concurrent.futures import ProcessPoolExecutor
+from ortools.linear_solver import pywraplp
+from WorkforcePlanningProblem import solve_workforce_column_generation, make_requirements
+import numpy as np
+import time
+
+
+# Requirements: demand of every period of the horizon
+# Window, commit: number of periods solved / fixed in each step
+# (window - commit should be at least max_length so that every shift
+# starting in the committed prefix can be chosen with any length)
+def solve_rolling_horizon(requirements, shift_cost, min_length, max_length,
+                          window=192, commit=96, integer=False):
+    requirements = np.asarray(requirements, dtype=float)
+    num_periods = len(requirements)
+    carried = np.zeros(num_periods)  # Coverage of the committed shifts
+    committed = []  # (first, last, count), periods of the whole horizon
+    total_cost, windows, start = 0.0, 0, 0
+    while start < num_periods:
+        end = min(start + window, num_periods)
+        # The last window commits everything it solves
+        boundary = end - start if end == num_periods else commit
+        residual = np.maximum(requirements[start:end] - carried[start:end], 0)
+        status, obj_val, pool, values, _ = solve_workforce_column_generation(
+            end - start, residual, shift_cost, min_length, max_length, integer=integer)
+        if status not in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
+            raise RuntimeError(f"The window starting at period {start + 1} has no solution")
+        for (first, last), count in zip(pool, values):
+            if count > 1e-9 and first <= boundary:
+                first, last = first + start, last + start
+                committed.append((first, last, count))
+                carried[first - 1:last] += count
+                total_cost += count * shift_cost[last - first + 1]
+        start += boundary
+        windows += 1
+    return total_cost, committed, windows
+
+
+def _solve_rolling_horizon(args):
+    return solve_rolling_horizon(*args)
+
+
+# Scenarios: independent demand series, one rolling horizon per process
+def solve_rolling_horizon_scenarios(scenarios, shift_cost, min_length, max_length,
+                                    window=192, commit=96, integer=False, processes=None):
+    tasks = [(requirements, shift_cost, min_length, max_length, window, commit, integer)
+             for requirements in scenarios]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(_solve_rolling_horizon, tasks))
+
+
+# Independent windows: the horizon is cut into blocks (e.g. weeks) that are
+# solved in parallel, shifts do not cross the cut between two blocks
+def solve_rolling_horizon_blocks(requirements, shift_cost, min_length, max_length,
+                                 block_length=672, window=192, commit=96,
+                                 integer=False, processes=None):
+    requirements = np.asarray(requirements, dtype=float)
+    offsets = list(range(0, len(requirements), block_length))
+    blocks = [requirements[offset:offset + block_length] for offset in offsets]
+    results = solve_rolling_horizon_scenarios(blocks, shift_cost, min_length, max_length,
+                                              window, commit, integer, processes)
+    total_cost, committed, windows = 0.0, [], 0
+    for offset, (cost, shifts, count) in zip(offsets, results):
+        total_cost += cost
+        committed.extend((first + offset, last + offset, n) for first, last, n in shifts)
+        windows += count
+    return total_cost, committed, windows
+
+
+def main():
+    # Shifts of 4 to 10 hours in quarter-hour periods
+    min_length, max_length = 16, 40
+    shift_cost = [8 + length for length in range(max_length + 1)]
+    # Smaller instance (2 weeks): rolling horizon against one full solve
+    requirements = make_requirements(1344)
+    start = time.perf_counter()
+    status, full_cost, pool, values, iterations = solve_workforce_column_generation(
+        len(requirements), requirements, shift_cost, min_length, max_length)
+    full_time = time.perf_counter() - start
+    start = time.perf_counter()
+    cost, committed, windows = solve_rolling_horizon(requirements, shift_cost,
+                                                     min_length, max_length)
+    rolling_time = time.perf_counter() - start
+    print(f"Full solve: cost = {full_cost:.2f} ({full_time:.2f} s)")
+    print(f"Rolling horizon: cost = {cost:.2f} ({rolling_time:.2f} s, {windows} windows), "
+          f"gap = {100 * (cost - full_cost) / full_cost:.3f}%")
+    # Year-long demand series: 35,040 periods, weekly blocks in parallel
+    requirements = make_requirements(35040)
+    start = time.perf_counter()
+    cost, committed, windows = solve_rolling_horizon_blocks(requirements, shift_cost,
+                                                            min_length, max_length)
+    print(f"One year: cost = {cost:.2f}, {len(committed)} shifts, {windows} windows, "
+          f"{time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()